@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 import os
 from pathlib import Path
 
+from celery.schedules import crontab
+
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -59,6 +61,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "main.middleware.ReplicaRoutingMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -103,9 +106,33 @@ DATABASES = {
         "PORT": os.getenv("DB_PORT", "5432"),
         "OPTIONS": {"sslmode": os.getenv("DATABASE_SSLMODE", "disable")},
         "ATOMIC_REQUESTS": True,
+        # Seconds a connection is kept open and reused by later requests and Celery tasks, 0 closes it every time
+        "CONN_MAX_AGE": int(os.getenv("DB_CONN_MAX_AGE", "60")),
+        # Check a reused connection is still alive before the first query of each request or task
+        "CONN_HEALTH_CHECKS": os.getenv("DB_CONN_HEALTH_CHECKS", "TRUE").upper()
+        == "TRUE",
     }
 }
 
+# Optional read replica of the default database, receiving the reads of REPLICA_ROUTED_MODELS
+if os.getenv("DB_REPLICA_HOST"):
+    DATABASES["replica"] = {
+        **DATABASES["default"],
+        "HOST": os.getenv("DB_REPLICA_HOST"),
+        "PORT": os.getenv("DB_REPLICA_PORT", DATABASES["default"]["PORT"]),
+        "ATOMIC_REQUESTS": False,
+        "TEST": {"MIRROR": "default"},
+    }
+
+DATABASE_ROUTERS = ["main.routers.ReplicaRouter"]
+
+# Models read from the replica by safe requests, as "app_label.model_name". Models whose reads are cached
+# (policies, social media links, unread notifications) stay on the primary, a lagging read would otherwise be
+# cached for longer than the lag itself.
+REPLICA_ROUTED_MODELS = ["main.contact", "main.outgoingemail", "auditlog.logentry"]
+# Seconds a client reads from the primary after a write, this should cover the replication lag
+REPLICA_PIN_SECONDS = int(os.getenv("DB_REPLICA_PIN_SECONDS", "5"))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -234,10 +261,96 @@ LOGIN_URL = "login"
 REDIS_HOST = os.getenv("REDIS_HOST")
 REDIS_PORT = int(os.getenv("REDIS_PORT"))
 
+# Cache settings
+# The shared cache lives in its own Redis database, keys are prefixed per environment so several
+# environments can share one Redis. The local cache is the per-process first tier of main.cache.tiered_cache
+# and only keeps values for a few seconds, which bounds how stale other processes can be after a change.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": f"redis://{REDIS_HOST}:{REDIS_PORT}/1",
+        "KEY_PREFIX": os.getenv("CACHE_KEY_PREFIX") or SENTRY_ENV,
+    },
+    "local": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "local",
+        "TIMEOUT": 10,
+        "OPTIONS": {"MAX_ENTRIES": 1000},
+    },
+}
+
 # settings.py
 CELERY_BROKER_URL = f"redis://{REDIS_HOST}:{REDIS_PORT}/0"
 CELERY_RESULT_BACKEND = "django-db"
 CELERY_RESULT_EXTENDED = True  # needed for django-celery results
+# Disables Celery's built-in cleanup, old results are purged in batches by main.tasks.purge_task_results_task
+CELERY_RESULT_EXPIRES = None
+# Stored task results are deleted once they are older than this many days
+TASK_RESULT_RETENTION_DAYS = int(os.getenv("TASK_RESULT_RETENTION_DAYS", "7"))
+# Number of task results deleted per statement
+TASK_RESULT_PURGE_BATCH_SIZE = 5000
+# Periodic tasks, synced into django_celery_beat by its database scheduler
+CELERY_BEAT_SCHEDULE = {
+    "purge-read-notifications": {
+        "task": "main.tasks.purge_read_notifications_task",
+        "schedule": crontab(hour=3, minute=0),
+    },
+    "purge-task-results": {
+        "task": "main.tasks.purge_task_results_task",
+        "schedule": crontab(hour=4, minute=0),
+    },
+    "drain-email-outbox": {
+        "task": "main.tasks.drain_email_outbox_task",
+        "schedule": crontab(),  # every minute
+    },
+}
+
+# Notification settings
+# Number of unread notifications shown in the navbar dropdown
+NOTIFICATION_DROPDOWN_LIMIT = 10
+# Unread counts are capped at this value, the badge shows "99+" from here on
+NOTIFICATION_BADGE_LIMIT = 100
+# Seconds the unread count and latest unread notifications of a user stay cached, kept short since a read
+# racing a concurrent commit can cache a stale value
+NOTIFICATION_CACHE_TIMEOUT = 60
+# Number of notifications inserted per query when notifying many users at once
+NOTIFICATION_BULK_BATCH_SIZE = 1000
+# Read notifications are deleted once they are older than this many days
+NOTIFICATION_RETENTION_DAYS = int(os.getenv("NOTIFICATION_RETENTION_DAYS", "90"))
+# Number of notifications deleted per statement by the retention task
+NOTIFICATION_RETENTION_BATCH_SIZE = 5000
+
+# Restore settings
+# Columns set to an SQL expression by `restore_db --anonymize`, the rows are updated in chunks of primary keys
+RESTORE_ANONYMIZE_RULES = {
+    "users_user": {
+        # Usernames cannot contain a colon, so no row still to be anonymized can hold the new username
+        "username": "'user:' || id",
+        "email": "'user-' || id || '@anonymized.invalid'",
+        "first_name": "''",
+        "last_name": "''",
+    },
+    "main_contact": {
+        "name": "'Contact ' || id",
+        "email": "'contact-' || id || '@anonymized.invalid'",
+        "message": "'Anonymized message.'",
+        "admin_notes": "NULL",
+    },
+    "main_notification": {
+        "title": "'Notification ' || id",
+        "message": "'Anonymized notification.'",
+    },
+    "main_outgoingemail": {
+        "recipient": "'recipient-' || id || '@anonymized.invalid'",
+        "message": "'Anonymized email.'",
+    },
+}
+# Number of primary keys covered by a single anonymizing UPDATE
+RESTORE_ANONYMIZE_CHUNK_SIZE = 50000
+
+# Page cache settings
+# Serve the public pages opted in with `cache_page_for_anonymous` from the cache for anonymous visitors
+PAGE_CACHE_ENABLED = os.getenv("PAGE_CACHE_ENABLED", "TRUE").upper() == "TRUE"
 
 # Google Captcha Settings
 RECAPTCHA_PRIVATE_KEY = os.getenv("RECAPTCHA_PRIVATE_KEY")
@@ -255,3 +368,8 @@ EMAIL_HOST = os.getenv("EMAIL_HOST")
 EMAIL_HOST_USER = os.getenv("EMAIL_HOST_USER")
 EMAIL_HOST_PASSWORD = os.getenv("EMAIL_HOST_PASSWORD")
 DEFAULT_FROM_EMAIL = os.getenv("DEFAULT_FROM_EMAIL")
+
+# Number of outbox emails claimed and sent per transaction by the drainer
+EMAIL_OUTBOX_BATCH_SIZE = 100
+# Emails failing this many times are marked as failed instead of retried
+EMAIL_OUTBOX_MAX_ATTEMPTS = 3
@@ -17,6 +17,7 @@ from main.models import (
     Contact,
     AuditLogConfig,
     SocialMediaLink,
+    OutgoingEmail,
 )
 
 
@@ -133,3 +134,23 @@ class SocialMediaLinkAdmin(admin.ModelAdmin):
     """
 
     list_display = ["platform_name", "profile_url", "image"]
+
+
+@admin.register(OutgoingEmail)
+class OutgoingEmailAdmin(admin.ModelAdmin):
+    """
+    The Admin View for the OutgoingEmail Model.
+    """
+
+    list_display = (
+        "recipient",
+        "subject",
+        "status",
+        "attempts",
+        "created_at",
+        "sent_at",
+    )
+    list_filter = ("status",)
+    search_fields = ("recipient", "subject")
+    readonly_fields = ("attempts", "last_error", "created_at", "sent_at")
+    list_per_page = 25
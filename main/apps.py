@@ -8,3 +8,10 @@ class MainConfig(AppConfig):
 
     default_auto_field = "django.db.models.BigAutoField"
     name = "main"
+
+    def ready(self):
+        """
+        Connect the signal receivers of the app.
+        """
+        # pylint: disable=import-outside-toplevel,unused-import
+        from main import signals  # noqa: F401
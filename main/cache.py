@@ -0,0 +1,182 @@
+import hashlib
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Any, Callable, Iterator
+
+from django.conf import settings
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.cache import cache, caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.utils.cache import patch_vary_headers
+
+PAGE_CACHE_VERSION_KEY = "page_cache:version"
+
+_MISSING = object()
+
+# Set while a page is rendered for the page cache
+_shared_tier_only = ContextVar("shared_tier_only", default=False)
+
+
+class TieredCache:
+    """
+    Two-tier cache for hot read-mostly objects.
+
+    Values are read from a per-process local cache first and from the shared cache on a local miss. Deleting
+    a key only clears the local cache of the current process, other processes keep their local copy until it
+    expires after the local cache's short default timeout. Within `shared_tier_only` the local cache is
+    skipped.
+    """
+
+    def __init__(self, local_alias: str = "local", shared_alias: str = "default"):
+        self.local_alias = local_alias
+        self.shared_alias = shared_alias
+
+    @property
+    def local(self):
+        """
+        Return the per-process first tier.
+        """
+        return caches[self.local_alias]
+
+    @property
+    def shared(self):
+        """
+        Return the shared second tier.
+        """
+        return caches[self.shared_alias]
+
+    def get_or_set(self, key: str, default: Any, timeout: Any = DEFAULT_TIMEOUT) -> Any:
+        """
+        Return the value of a key, computing and storing it in both tiers when neither has it.
+
+        :param key: The cache key
+        :param default: The value, or a callable returning it, to store on a miss.
+        :param timeout: Timeout of the value in the shared cache, the local cache uses its own default.
+        :return: The cached value
+        """
+        if _shared_tier_only.get():
+            return self.shared.get_or_set(key, default, timeout=timeout)
+        value = self.local.get(key, _MISSING)
+        if value is _MISSING:
+            value = self.shared.get_or_set(key, default, timeout=timeout)
+            self.local.set(key, value)
+        return value
+
+    def delete(self, key: str) -> None:
+        """
+        Delete a key from the shared cache and the local cache of this process.
+        """
+        self.shared.delete(key)
+        self.local.delete(key)
+
+
+tiered_cache = TieredCache()
+
+
+@contextmanager
+def shared_tier_only() -> Iterator[None]:
+    """
+    Read the tiered cache from the shared tier only within the block.
+
+    A page stored in the page cache outlives the local copies, a stale local copy another process still
+    holds after an invalidation would otherwise be cached as part of the page under the new version.
+    """
+    token = _shared_tier_only.set(True)
+    try:
+        yield
+    finally:
+        _shared_tier_only.reset(token)
+
+
+def get_page_cache_version() -> int:
+    """
+    Return the current version of the page cache, which is part of every cached page's key.
+    """
+    return cache.get_or_set(PAGE_CACHE_VERSION_KEY, 1, timeout=None)
+
+
+def invalidate_page_cache() -> None:
+    """
+    Expire every cached page at once by moving to the next version of the page cache.
+    """
+    try:
+        cache.incr(PAGE_CACHE_VERSION_KEY)
+    except ValueError:
+        pass  # Nothing cached yet
+
+
+def is_page_cacheable(request) -> bool:
+    """
+    Check if the response to a request may be served from and stored in the page cache.
+
+    Only visitors without a session are considered, which makes them anonymous without touching the
+    session store. Visitors with pending messages are left out since their page shows them.
+
+    :param request: HttpRequest object
+    :return: True if the page cache applies to the request
+    """
+    return (
+        settings.PAGE_CACHE_ENABLED
+        and request.method in ("GET", "HEAD")
+        and settings.SESSION_COOKIE_NAME not in request.COOKIES
+        and CookieStorage.cookie_name not in request.COOKIES
+    )
+
+
+def get_page_cache_key(request, vary_on_csrf: bool) -> str:
+    """
+    Return the cache key of the page for a request.
+
+    :param request: HttpRequest object
+    :param vary_on_csrf: Whether the page embeds a CSRF token, which only matches the visitor's CSRF cookie.
+    :return: The cache key
+    """
+    url = request.build_absolute_uri()
+    if vary_on_csrf:
+        url += "|" + request.COOKIES.get(settings.CSRF_COOKIE_NAME, "")
+    digest = hashlib.md5(url.encode(), usedforsecurity=False).hexdigest()
+    return f"page_cache:{get_page_cache_version()}:{request.method}:{digest}"
+
+
+def cache_page_for_anonymous(timeout: int, vary_on_csrf: bool = False) -> Callable:
+    """
+    Decorator caching the full response of a view for anonymous visitors.
+
+    Pages embedding a CSRF token must set `vary_on_csrf`, they are then cached per CSRF cookie and never
+    for visitors who have none yet. Other pages using a CSRF token are not cached at all. A page that may be
+    cached is rendered right away with `shared_tier_only`.
+
+    :param timeout: Number of seconds a page stays cached.
+    :param vary_on_csrf: Whether the page embeds a CSRF token.
+    :return: The decorator
+    """
+
+    def decorator(view_func: Callable) -> Callable:
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if not is_page_cacheable(request):
+                return view_func(request, *args, **kwargs)
+
+            key = get_page_cache_key(request, vary_on_csrf)
+            response = cache.get(key)
+            if response is not None:
+                return response
+
+            with shared_tier_only():
+                response = view_func(request, *args, **kwargs)
+                if hasattr(response, "render") and callable(response.render):
+                    response.render()
+            patch_vary_headers(response, ["Cookie"])
+
+            uses_csrf = request.META.get("CSRF_COOKIE_NEEDS_UPDATE", False)
+            has_csrf_cookie = settings.CSRF_COOKIE_NAME in request.COOKIES
+            if response.status_code == 200 and not (
+                uses_csrf and not (vary_on_csrf and has_csrf_cookie)
+            ):
+                cache.set(key, response, timeout)
+            return response
+
+        return wrapper
+
+    return decorator
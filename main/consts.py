@@ -42,3 +42,23 @@ class ContactType(Enum):
             A list of tuple containing the enum's items.
         """
         return [(key.value, key.value) for key in cls]
+
+
+class EmailStatus(Enum):
+    """
+    Enum representing the delivery statuses of emails in the outbox.
+    """
+
+    PENDING = "Pending"
+    SENT = "Sent"
+    FAILED = "Failed"
+
+    @classmethod
+    def choices(cls) -> list:
+        """
+        Return choices for model field.
+
+        Returns:
+            A list of tuple containing the enum's items.
+        """
+        return [(key.value, key.value) for key in cls]
@@ -0,0 +1,93 @@
+import sys
+import time
+
+import psycopg2
+from django.conf import settings
+from django.core.management import BaseCommand
+
+from main.management.commands.restore_db import Command as RestoreDbCommand
+from main.management.restore import Anonymizer
+
+WARNING_ON_LIVE_SERVER = "Running the `anonymize_db` command on a live server."
+ERROR_TARGET_NOT_VALID = "{} is not a valid target. Available options: {}"
+ANONYMIZE_FAILED = "Anonymizing failed with error: {}"
+TABLE_ANONYMIZED = "Anonymized {} rows of {} in {:.1f}s."
+ANONYMIZE_FINISHED = "Anonymized {} rows in {} tables in {:.1f}s."
+
+
+class Command(BaseCommand):
+    """
+    A management command to anonymize the personal data of a restored database.
+    """
+
+    help = (
+        "A management command to anonymize the personal data of a restored database with the rules in "
+        "RESTORE_ANONYMIZE_RULES."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "-t",
+            "--target",
+            type=str,
+            help="Indicates what database you want to anonymize, options are local, test, develop.",
+            default="local",
+        )
+
+        parser.add_argument(
+            "-j",
+            "--jobs",
+            type=int,
+            help="Number of tables anonymized at once. Defaults to all tables.",
+            default=None,
+        )
+
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            help="Number of primary keys covered by a single UPDATE.",
+            default=settings.RESTORE_ANONYMIZE_CHUNK_SIZE,
+        )
+
+    def handle(self, *args, **kwargs):
+        """
+        Handle the management command.
+        """
+        if not settings.DEBUG:
+            self.stdout.write(WARNING_ON_LIVE_SERVER)
+            sys.exit(1)
+
+        targets = [
+            target
+            for target in RestoreDbCommand.DATABASE_CONFIG
+            if target != "production"
+        ]
+        if kwargs["target"] not in targets:
+            self.stdout.write(
+                ERROR_TARGET_NOT_VALID.format(kwargs["target"], ", ".join(targets))
+            )
+            sys.exit(1)
+
+        rules = settings.RESTORE_ANONYMIZE_RULES
+        anonymizer = Anonymizer(
+            RestoreDbCommand.get_connection_kwargs(kwargs["target"]),
+            rules,
+            kwargs["chunk_size"],
+            kwargs["jobs"] or len(rules),
+        )
+        start = time.monotonic()
+        try:
+            results = anonymizer.anonymize()
+        except psycopg2.Error as e:
+            self.stdout.write(ANONYMIZE_FAILED.format(e))
+            sys.exit(1)
+
+        for table, (rows, duration) in sorted(results.items()):
+            self.stdout.write(TABLE_ANONYMIZED.format(rows, table, duration))
+        self.stdout.write(
+            ANONYMIZE_FINISHED.format(
+                sum(rows for rows, _ in results.values()),
+                len(results),
+                time.monotonic() - start,
+            )
+        )
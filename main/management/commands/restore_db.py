@@ -1,11 +1,33 @@
 import os
+import shlex
+import shutil
 import subprocess
 import sys
-from typing import Dict, List
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import nullcontext
+from typing import IO, Dict, List, Optional, Sequence, Tuple, Union
 
 from django.conf import settings
 from django.core.management import BaseCommand
 
+from main.management.restore import (
+    COMPRESS_MIN_VERSIONS,
+    COMPRESS_PATTERN,
+    RESTORE_CLEAN_ARGS,
+    DumpCache,
+    MediaSync,
+    describe_dump_size,
+    get_compress_args,
+    get_maintenance_phases,
+    get_pg_dump_version,
+    get_stream_args,
+    get_table_sizes,
+    get_tuned_env,
+    is_valid_compress,
+    stream_dump,
+)
+
 
 def create_command(db_config: Dict[str, str], command_template: str, *args) -> str:
     """
@@ -31,6 +53,32 @@ ERROR_BACKUP_FILE_MISSING = "The backup file '{}' does not exist. Exiting."
 WARNING_ON_LIVE_SERVER = "Running the `restore_local_db` command on a live server."
 NO_COMMANDS_MESSAGE = "No commands to be run. Exiting."
 CONFIRM_RUN_COMMANDS = "\nThe following commands will be run:"
+ERROR_INVALID_JOBS = "The number of jobs must be at least 1. Exiting."
+PHASE_FINISHED = "{} finished in {:.1f}s."
+ERROR_STREAM_ARGUMENTS = "--stream needs a source other than local, a restore and a single target and cannot be combined with --jobs. Exiting."
+ERROR_TABLE_ARGUMENTS = (
+    "Selecting tables needs a source other than local to dump from. Exiting."
+)
+ERROR_CACHE_ARGUMENTS = "--max-age needs a source other than local and cannot be combined with --stream. Exiting."
+REUSING_CACHED_DUMP = "Reusing the cached dump {}."
+ERROR_MEDIA_SOURCE = (
+    "--copy-media needs a source with a configured media directory. Exiting."
+)
+COPY_MEDIA = "copy media from {} to {}"
+MEDIA_SYNCED = "Copied {copied} media files ({bytes} bytes), skipped {skipped} unchanged and {failed} failed."
+STREAM_PROGRESS = "Streamed {:.0f} MiB."
+STREAM_FAILED = "Streaming the dump failed, falling back to dumping into {}."
+ERROR_INVALID_COMPRESS = (
+    "{} is not a valid compression, use none, gzip (levels 0 to 9), lz4 (1 to 12) or zstd (1 to 22) with an "
+    "optional level like zstd:3, or a gzip level from 0 to 9. Exiting."
+)
+ERROR_COMPRESS_NOT_SUPPORTED = "{} compression needs pg_dump {} or newer. Exiting."
+ERROR_DRY_RUN_SOURCE = "--dry-run needs a source to measure. Exiting."
+RESTORE_TARGET_FINISHED = "Restore of {} {} in {:.1f}s, see {}."
+RESTORE_SUMMARY = "Restored {} of {} targets in {:.1f}s."
+
+# Number of threads copying media files unless --jobs is given
+MEDIA_SYNC_WORKERS = 8
 
 
 class Command(BaseCommand):
@@ -43,6 +91,13 @@ class Command(BaseCommand):
         "production."
     )
 
+    # Media directories of the environments, e.g. mounted volumes, that --copy-media copies from
+    MEDIA_ROOTS: Dict[str, Optional[str]] = {
+        "test": os.environ.get("TEST_MEDIA_ROOT"),
+        "develop": os.environ.get("DEV_MEDIA_ROOT"),
+        "production": os.environ.get("PROD_MEDIA_ROOT"),
+    }
+
     DATABASE_CONFIG: Dict[str, Dict[str, str]] = {
         "local": {
             "host": os.environ.get("DB_HOST"),
@@ -70,6 +125,17 @@ class Command(BaseCommand):
         },
     }
 
+    # Tables whose data is skipped by a profile, their schema is still restored
+    PROFILES: Dict[str, List[str]] = {
+        "slim": [
+            "django_celery_results_taskresult",
+            "django_celery_results_groupresult",
+            "auditlog_logentry",
+            "main_notification",
+            "main_outgoingemail",
+        ],
+    }
+
     def add_arguments(self, parser):
         parser.add_argument(
             "-s",
@@ -85,9 +151,11 @@ class Command(BaseCommand):
             "-t",
             "--target",
             type=str,
+            nargs="+",
             help="Indicates what database you want to load the dump file to, "
-            "options are local, test, develop",
-            default="local",
+            "options are local, test, develop. Several targets are restored in parallel from a single dump, "
+            "each logging into its own log file next to the dump.",
+            default=["local"],
         )
 
         parser.add_argument(
@@ -115,7 +183,115 @@ class Command(BaseCommand):
         parser.add_argument(
             "-cp",
             "--copy-media",
-            help="Flag if you also want to copy media to your destination.",
+            help="Flag if you also want to copy the media of the source into MEDIA_ROOT. Only changed files "
+            "are copied.",
+            action="store_true",
+        )
+
+        parser.add_argument(
+            "-j",
+            "--jobs",
+            type=int,
+            nargs="?",
+            const=os.cpu_count(),
+            default=None,
+            help="Dump in directory format and dump and restore with this many parallel jobs. "
+            "Defaults to the number of CPUs when given without a value.",
+        )
+
+        parser.add_argument(
+            "--compress",
+            type=str,
+            help="Compression of the dump: none, gzip (levels 0 to 9), lz4 (1 to 12) or zstd (1 to 22) with an "
+            "optional level like zstd:3, or a gzip level from 0 to 9. lz4 and zstd need pg_dump 16. With --jobs every table is compressed by its own "
+            "job. Defaults to gzip.",
+            default=None,
+        )
+
+        parser.add_argument(
+            "--dry-run",
+            help="Report the table sizes of the source and the estimated size of the dump without running "
+            "anything.",
+            action="store_true",
+        )
+
+        parser.add_argument(
+            "--exclude-table-data",
+            help="Restore the schema but not the data of the given table. Can be given multiple times "
+            "and accepts pg_dump patterns.",
+            action="append",
+            default=[],
+        )
+
+        parser.add_argument(
+            "--include-table",
+            help="Only dump and restore the given table, pg_restore drops just the restored tables first "
+            "unless --no-drop is given. Can be given multiple times and accepts pg_dump patterns.",
+            action="append",
+            default=[],
+        )
+
+        parser.add_argument(
+            "--profile",
+            help="Skip the data of the bulk tables in the profile while keeping their schema. "
+            "The slim profile skips task results, audit logs, notifications and outgoing emails.",
+            choices=self.PROFILES.keys(),
+            default=None,
+        )
+
+        parser.add_argument(
+            "--max-age",
+            type=int,
+            help="Keep dumps in the dump cache and reuse a complete dump of the source that is at most "
+            "this many minutes old instead of dumping again.",
+            default=None,
+        )
+
+        parser.add_argument(
+            "--keep",
+            type=int,
+            help="Number of dumps per source kept in the dump cache.",
+            default=3,
+        )
+
+        parser.add_argument(
+            "--cache-dir",
+            type=str,
+            help="Directory of the dump cache.",
+            default=os.path.join(settings.BASE_DIR, "dump_cache"),
+        )
+
+        parser.add_argument(
+            "--stream",
+            help="Pipe the dump straight into pg_restore instead of writing it to a file first. "
+            "Falls back to the dump file if streaming fails.",
+            action="store_true",
+        )
+
+        parser.add_argument(
+            "--anonymize",
+            help="Anonymize the personal data of the target after the restore with the rules in "
+            "RESTORE_ANONYMIZE_RULES, see the anonymize_db command.",
+            action="store_true",
+        )
+
+        parser.add_argument(
+            "--maintenance-work-mem",
+            type=str,
+            help="maintenance_work_mem of the restore and maintenance sessions, used to build indexes.",
+            default="1GB",
+        )
+
+        parser.add_argument(
+            "--no-analyze",
+            help="Flag if you dont want to analyze the tables after the restore",
+            dest="analyze",
+            action="store_false",
+        )
+
+        parser.add_argument(
+            "--vacuum",
+            help="Vacuum and analyze the tables after the restore instead of only analyzing them.",
             action="store_true",
         )
 
@@ -125,19 +301,67 @@ class Command(BaseCommand):
             action="store_true",
         )
 
-    def validate_arguments(self, source: str, target: str, file_name: str) -> None:
+    def validate_arguments(  # pylint: disable=too-many-arguments
+        self,
+        source: str,
+        target: Union[str, Sequence[str]],
+        file_name: str,
+        *,
+        jobs: Optional[int] = None,
+        stream: bool = False,
+        restore: bool = True,
+        table_args: Sequence[str] = (),
+        max_age: Optional[int] = None,
+        copy_media: bool = False,
+        compress: Optional[str] = None,
+        dry_run: bool = False,
+    ) -> None:
         """
         Validate the provided command arguments and exit if they are not valid.
+
+        :param target: The target database or a list of target databases.
         """
         available_dbs = self.DATABASE_CONFIG.keys()
+        targets = [target] if isinstance(target, str) else target
+
+        if jobs is not None and jobs < 1:
+            self.stdout.write(ERROR_INVALID_JOBS)
+            sys.exit(1)
+
+        if stream and (
+            source in (None, "local") or not restore or jobs or len(targets) > 1
+        ):
+            self.stdout.write(ERROR_STREAM_ARGUMENTS)
+            sys.exit(1)
+
+        if table_args and source in (None, "local"):
+            self.stdout.write(ERROR_TABLE_ARGUMENTS)
+            sys.exit(1)
+
+        if max_age is not None and (source in (None, "local") or stream):
+            self.stdout.write(ERROR_CACHE_ARGUMENTS)
+            sys.exit(1)
+
+        if copy_media and not self.MEDIA_ROOTS.get(source):
+            self.stdout.write(ERROR_MEDIA_SOURCE)
+            sys.exit(1)
+
+        if dry_run and not source:
+            self.stdout.write(ERROR_DRY_RUN_SOURCE)
+            sys.exit(1)
+
+        self.validate_compress(compress)
 
-        if target == "production":
+        if "production" in targets:
             self.stdout.write(ERROR_CANNOT_DUMP_PROD)
             sys.exit(1)
 
-        if target not in available_dbs:
+        invalid_targets = [target for target in targets if target not in available_dbs]
+        if invalid_targets:
             self.stdout.write(
-                ERROR_DB_NOT_VALID.format(target, "target", ", ".join(available_dbs))
+                ERROR_DB_NOT_VALID.format(
+                    ", ".join(invalid_targets), "target", ", ".join(available_dbs)
+                )
             )
             sys.exit(1)
 
@@ -149,7 +373,7 @@ class Command(BaseCommand):
                     )
                 )
                 sys.exit(1)
-            if source == target:
+            if source in targets:
                 self.stdout.write(ERROR_SAME_DB)
                 sys.exit(0)
         else:
@@ -157,15 +381,78 @@ class Command(BaseCommand):
                 self.stdout.write(ERROR_BACKUP_FILE_MISSING.format(file_name))
                 sys.exit(1)
 
-    def run_commands(self, commands: List[str], env: Dict) -> None:
+    def validate_compress(self, compress: Optional[str]) -> None:
+        """
+        Validate the --compress value and exit if it is not valid or not supported by the installed pg_dump.
+        """
+        if compress is None:
+            return
+        if not is_valid_compress(compress):
+            self.stdout.write(ERROR_INVALID_COMPRESS.format(compress))
+            sys.exit(1)
+
+        method = COMPRESS_PATTERN.match(compress)["method"]
+        min_version = COMPRESS_MIN_VERSIONS.get(method)
+        if min_version and get_pg_dump_version() < min_version:
+            self.stdout.write(ERROR_COMPRESS_NOT_SUPPORTED.format(method, min_version))
+            sys.exit(1)
+
+    def run_commands(
+        self, commands: List[str], env: Dict, log: Optional[IO] = None
+    ) -> bool:
         """
         Execute the given commands.
+
+        :param log: File the output of the commands is written to instead of the console.
+        :return: True if all commands succeeded.
         """
+        output = {"stdout": log, "stderr": subprocess.STDOUT} if log else {}
+        succeeded = True
         for command in commands:
             try:
-                subprocess.check_call(command, env=env, shell=True)
+                subprocess.check_call(command, env=env, shell=True, **output)
             except subprocess.CalledProcessError as e:
                 self.stdout.write(f"Command failed with error: {e}")
+                succeeded = False
+        return succeeded
+
+    def run_phase(
+        self, phase: str, commands: List[str], env: Dict, log: Optional[IO] = None
+    ) -> bool:
+        """
+        Execute the commands of a phase and report how long it took.
+
+        :return: True if all commands succeeded.
+        """
+        start = time.monotonic()
+        succeeded = self.run_commands(commands, env, log)
+        self.stdout.write(PHASE_FINISHED.format(phase, time.monotonic() - start))
+        return succeeded
+
+    def run_target_phases(
+        self,
+        target: str,
+        phases: Dict[str, List[str]],
+        kwargs: Dict,
+        log_path: Optional[str] = None,
+    ) -> bool:
+        """
+        Run the phases of a target one after another with the tuned session settings.
+
+        :param phases: Commands per phase from `generate_target_phases`, phases without commands are skipped.
+        :param log_path: Log file of the target when several targets are restored at once.
+        :return: True if all commands succeeded.
+        """
+        env = get_tuned_env(self.get_env_for_db(target), kwargs["maintenance_work_mem"])
+        succeeded = True
+        with open(
+            log_path, "w", encoding="utf-8"
+        ) if log_path else nullcontext() as log:
+            for phase, commands in phases.items():
+                if commands:
+                    name = phase if log is None else f"{phase} of {target}"
+                    succeeded = self.run_phase(name, commands, env, log) and succeeded
+        return succeeded
 
     def handle(self, *args, **kwargs):
         """
@@ -175,52 +462,319 @@ class Command(BaseCommand):
             self.stdout.write(WARNING_ON_LIVE_SERVER)
             sys.exit(1)
 
-        source = kwargs["source"]
-        target = kwargs["target"]
+        source, target = kwargs["source"], kwargs["target"]
+        # A single target may be passed as a string, e.g. by call_command
+        targets = list(dict.fromkeys([target] if isinstance(target, str) else target))
+        table_args = self.get_table_args(kwargs)
+
+        self.validate_arguments(
+            source,
+            targets,
+            kwargs["file_name"],
+            jobs=kwargs["jobs"],
+            stream=kwargs["stream"],
+            restore=kwargs["restore"],
+            table_args=table_args,
+            max_age=kwargs["max_age"],
+            copy_media=kwargs["copy_media"],
+            compress=kwargs["compress"],
+            dry_run=kwargs["dry_run"],
+        )
+
+        if kwargs["dry_run"]:
+            table_sizes = get_table_sizes(self.get_connection_kwargs(source))
+            for line in describe_dump_size(
+                source, table_sizes, table_args, kwargs["compress"]
+            ):
+                self.stdout.write(line)
+            return
+
+        if kwargs["stream"]:
+            self.handle_stream(source, targets[0], kwargs, table_args)
+            return
+
+        file_name, reused = self.get_dump_file(source, kwargs, table_args)
+        source_commands = (
+            []
+            if reused
+            else self.generate_source_commands(
+                source,
+                file_name,
+                kwargs["jobs"],
+                table_args,
+                compress=kwargs["compress"],
+                no_input=kwargs["no_input"],
+            )
+        )
+        target_phases = {
+            target: self.generate_target_phases(target, kwargs, file_name)
+            for target in targets
+        }
+
+        self.confirm_commands(
+            source_commands
+            + [
+                command
+                for phases in target_phases.values()
+                for commands in phases.values()
+                for command in commands
+            ]
+            + self.describe_copy_media(source, kwargs),
+            kwargs["no_input"],
+        )
+        self.run_dump(source, source_commands, file_name, kwargs)
+        if len(targets) == 1:
+            self.run_target_phases(targets[0], target_phases[targets[0]], kwargs)
+        else:
+            self.restore_targets(target_phases, file_name, kwargs)
+        self.copy_media(source, kwargs)
+
+    def restore_targets(
+        self,
+        target_phases: Dict[str, Dict[str, List[str]]],
+        file_name: str,
+        kwargs: Dict,
+    ) -> None:
+        """
+        Restore the dump into all targets in parallel and summarize the durations and failures.
+
+        Each target gets its own pg_restore processes and a log file next to the dump.
+        """
+        start = time.monotonic()
+        restored = 0
+        # Every target has its own worker, so all of them start right away
+        with ThreadPoolExecutor(max_workers=len(target_phases)) as executor:
+            futures = {
+                executor.submit(
+                    self.run_target_phases,
+                    target,
+                    phases,
+                    kwargs,
+                    f"{file_name}.{target}.log",
+                ): target
+                for target, phases in target_phases.items()
+            }
+            for future in as_completed(futures):
+                target = futures[future]
+                succeeded = future.result()
+                restored += succeeded
+                self.stdout.write(
+                    RESTORE_TARGET_FINISHED.format(
+                        target,
+                        "finished" if succeeded else "failed",
+                        time.monotonic() - start,
+                        f"{file_name}.{target}.log",
+                    )
+                )
+        self.stdout.write(
+            RESTORE_SUMMARY.format(
+                restored, len(target_phases), time.monotonic() - start
+            )
+        )
+
+    def handle_stream(
+        self, source: str, target: str, kwargs: Dict, table_args: Sequence[str]
+    ) -> None:
+        """
+        Restore the target by piping the dump of the source into pg_restore.
+
+        Falls back to dumping into the dump file and restoring from it if streaming fails.
+        """
         file_name = kwargs["file_name"]
+        post_restore_phases = self.generate_target_phases(target, kwargs, file_name)
+        # The restore from the dump file is replaced by the pipe
+        prepare_commands = post_restore_phases.pop("Restore")[:-1]
+        dump_args, restore_args = get_stream_args(
+            self.DATABASE_CONFIG[source],
+            self.DATABASE_CONFIG[target],
+            table_args,
+            kwargs["compress"],
+            clean=kwargs["drop"] and bool(kwargs["include_table"]),
+        )
+        self.confirm_commands(
+            prepare_commands
+            + [f"{shlex.join(dump_args)} | {shlex.join(restore_args)}"]
+            + [
+                command
+                for commands in post_restore_phases.values()
+                for command in commands
+            ]
+            + self.describe_copy_media(source, kwargs),
+            kwargs["no_input"],
+        )
 
-        self.validate_arguments(source, target, file_name)
+        self.run_target_phases(target, {"Prepare": prepare_commands}, kwargs)
+        start = time.monotonic()
+        streamed, restore_code = stream_dump(
+            dump_args,
+            restore_args,
+            self.get_env_for_db(source),
+            get_tuned_env(self.get_env_for_db(target), kwargs["maintenance_work_mem"]),
+            lambda copied: self.stdout.write(STREAM_PROGRESS.format(copied / 2**20)),
+        )
+        if restore_code:
+            error = subprocess.CalledProcessError(restore_code, restore_args)
+            self.stdout.write(f"Command failed with error: {error}")
+        self.stdout.write(PHASE_FINISHED.format("Stream", time.monotonic() - start))
+        if not streamed:
+            self.stdout.write(STREAM_FAILED.format(file_name))
+            source_commands = self.generate_source_commands(
+                source,
+                file_name,
+                kwargs["jobs"],
+                table_args,
+                compress=kwargs["compress"],
+                no_input=kwargs["no_input"],
+            )
+            self.run_dump(source, source_commands, file_name, kwargs)
+            self.run_target_phases(
+                target,
+                {"Restore": self.generate_target_commands(target, kwargs, file_name)},
+                kwargs,
+            )
+        self.run_target_phases(target, post_restore_phases, kwargs)
+        self.copy_media(source, kwargs)
 
-        source_commands = self.generate_source_commands(source, file_name)
-        target_commands = self.generate_target_commands(target, kwargs, file_name)
+    def describe_copy_media(self, source: str, kwargs: Dict) -> List[str]:
+        """
+        Describe the media copy for the list of commands that will be run.
+        """
+        if not kwargs["copy_media"]:
+            return []
+        return [COPY_MEDIA.format(self.MEDIA_ROOTS[source], settings.MEDIA_ROOT)]
 
-        all_commands = source_commands + target_commands
-        if not all_commands:
+    def copy_media(self, source: str, kwargs: Dict) -> None:
+        """
+        Copy the changed media files of the source into MEDIA_ROOT if --copy-media is given.
+        """
+        if not kwargs["copy_media"]:
+            return
+        start = time.monotonic()
+        media_sync = MediaSync(
+            self.MEDIA_ROOTS[source],
+            settings.MEDIA_ROOT,
+            kwargs["jobs"] or MEDIA_SYNC_WORKERS,
+        )
+        self.stdout.write(MEDIA_SYNCED.format(**media_sync.sync()))
+        self.stdout.write(PHASE_FINISHED.format("Copy media", time.monotonic() - start))
+
+    def confirm_commands(self, commands: List[str], no_input: bool) -> None:
+        """
+        List the commands that will be run and exit unless the user wants to continue.
+        """
+        if not commands:
             self.stdout.write(NO_COMMANDS_MESSAGE)
             sys.exit(0)
 
         self.stdout.write(CONFIRM_RUN_COMMANDS)
-        for command in all_commands:
+        for command in commands:
             self.stdout.write(f"\t- {command}")
 
-        if (
-            not kwargs["no_input"]
-            and input("Would you like to continue? (y/n) ").lower() != "y"
-        ):
+        if not no_input and input("Would you like to continue? (y/n) ").lower() != "y":
             self.stdout.write("Exiting.")
             sys.exit(0)
-        if source:
-            self.run_commands(source_commands, self.get_env_for_db(source))
-        self.run_commands(target_commands, self.get_env_for_db(target))
 
-    def generate_source_commands(self, source: str, file_name: str) -> List[str]:
+    def get_dump_file(
+        self, source: str, kwargs: Dict, table_args: Sequence[str]
+    ) -> Tuple[str, bool]:
+        """
+        Return the dump file to restore from and whether it is a cached dump that can be reused.
+
+        Without `--max-age` this is the `--file-name`, otherwise a recent dump from the dump cache or the path
+        for a new one.
+        """
+        if kwargs["max_age"] is None:
+            return kwargs["file_name"], False
+
+        dump_cache = DumpCache(kwargs["cache_dir"])
+        dump_key = dump_cache.get_key(kwargs["jobs"], table_args)
+        cached_dump = dump_cache.find(source, dump_key, kwargs["max_age"])
+        if cached_dump:
+            self.stdout.write(REUSING_CACHED_DUMP.format(cached_dump))
+            return cached_dump, True
+        return dump_cache.new_path(source, dump_key), False
+
+    def run_dump(
+        self, source: str, commands: List[str], file_name: str, kwargs: Dict
+    ) -> None:
+        """
+        Run the dump commands and add a successful dump to the dump cache if it is used.
+        """
+        if not commands:
+            return
+        # The override was confirmed, pg_dump refuses to write a directory format dump over an existing file
+        # or into a non-empty directory
+        if os.path.isdir(file_name):
+            shutil.rmtree(file_name)
+        elif os.path.isfile(file_name):
+            os.remove(file_name)
+        dumped = self.run_phase("Dump", commands, self.get_env_for_db(source))
+        if dumped and kwargs["max_age"] is not None:
+            dump_cache = DumpCache(kwargs["cache_dir"])
+            dump_cache.store(file_name)
+            # The new dump is always kept, it is restored next
+            dump_cache.evict(
+                source,
+                dump_cache.get_key(kwargs["jobs"], self.get_table_args(kwargs)),
+                max(kwargs["keep"], 1),
+            )
+
+    def get_table_args(self, kwargs: Dict) -> List[str]:
+        """
+        Generate the pg_dump arguments selecting the tables and table data to dump.
+
+        The data of the tables given directly or by the profile is excluded.
+        """
+        excluded = [
+            *kwargs["exclude_table_data"],
+            *self.PROFILES.get(kwargs["profile"], []),
+        ]
+        return [f"--exclude-table-data={table}" for table in excluded] + [
+            f"--table={table}" for table in kwargs["include_table"]
+        ]
+
+    def generate_source_commands(  # pylint: disable=too-many-arguments
+        self,
+        source: str,
+        file_name: str,
+        jobs: Optional[int] = None,
+        table_args: Sequence[str] = (),
+        *,
+        compress: Optional[str] = None,
+        no_input: bool = False,
+    ) -> List[str]:
         """
         Generate the source commands based on the provided source and file_name.
+
+        An existing dump is only overridden after asking, unless `no_input` is set. With `jobs` the
+        dump is written in directory format by that many parallel jobs, `run_dump` removes an
+        existing dump first. The `table_args` from `get_table_args` are passed on to pg_dump. A
+        directory format dump compresses every table in its own job with the `compress` method.
         """
         source_commands = []
         if source and source != "local":
-            if os.path.exists(file_name):
+            if not no_input and os.path.exists(file_name):
                 prompt = f"Do you want to override {file_name}? (y/n) "
                 if input(prompt).lower() != "y":
                     self.stdout.write(f"Not overriding {file_name}. Exiting.")
                     sys.exit(0)
 
+            dump_options = " ".join(
+                [
+                    f"-Fd -j {jobs}" if jobs else "-Fc",
+                    *get_compress_args(compress),
+                    *map(shlex.quote, table_args),
+                ]
+            )
             command_template = (
-                "pg_dump -Fc -v --host={} --username={} --dbname={} -f {}"
+                "pg_dump {3} -v --host={0} --username={1} --dbname={2} -f {4}"
             )
             source_commands.append(
                 create_command(
-                    self.DATABASE_CONFIG[source], command_template, file_name
+                    self.DATABASE_CONFIG[source],
+                    command_template,
+                    dump_options,
+                    shlex.quote(file_name),
                 )
             )
         return source_commands
@@ -232,7 +786,9 @@ class Command(BaseCommand):
         Generate the target commands based on the provided target, kwargs, and file_name.
         """
         target_commands = []
-        if kwargs["drop"] and kwargs["restore"]:
+        # A selection of tables is dropped by pg_restore, the other tables of the target are kept
+        clean = kwargs["drop"] and bool(kwargs.get("include_table"))
+        if kwargs["drop"] and kwargs["restore"] and not clean:
             command_template = (
                 "psql --host={} --port=5432 --username={} --dbname={} -f {}"
             )
@@ -258,15 +814,50 @@ class Command(BaseCommand):
                 )
             )
 
-            command_template = "pg_restore -v  --no-owner --host={} --port=5432 --username={} --dbname={} {}"
+            restore_options = " ".join(
+                [
+                    *([f"-j {kwargs['jobs']}"] if kwargs.get("jobs") else []),
+                    *(RESTORE_CLEAN_ARGS if clean else []),
+                ]
+            )
+            command_template = "pg_restore -v {3} --no-owner --host={0} --port=5432 --username={1} --dbname={2} {4}"
             target_commands.append(
                 create_command(
-                    self.DATABASE_CONFIG[target], command_template, file_name
+                    self.DATABASE_CONFIG[target],
+                    command_template,
+                    restore_options,
+                    shlex.quote(file_name),
                 )
             )
 
         return target_commands
 
+    def generate_target_phases(
+        self, target: str, kwargs: Dict, file_name: str
+    ) -> Dict[str, List[str]]:
+        """
+        Generate the commands per phase of a target, the restore followed by the post restore phases.
+
+        The anonymization runs before the maintenance so the statistics are gathered on the anonymized data.
+        """
+        phases = {"Restore": self.generate_target_commands(target, kwargs, file_name)}
+        if not phases["Restore"]:
+            return phases
+        if kwargs["anonymize"]:
+            manage_path = os.path.join(settings.BASE_DIR, "manage.py")
+            phases["Anonymize"] = [
+                f"{sys.executable} {manage_path} anonymize_db --target={target}"
+            ]
+        if kwargs["analyze"] or kwargs["vacuum"]:
+            phases.update(
+                get_maintenance_phases(
+                    self.DATABASE_CONFIG[target],
+                    kwargs["jobs"] or os.cpu_count(),
+                    kwargs["vacuum"],
+                )
+            )
+        return phases
+
     def get_env_for_db(self, db_name: str) -> Dict:
         """
         Get the environment for the provided database name.
@@ -274,3 +865,17 @@ class Command(BaseCommand):
         env = os.environ.copy()
         env["PGPASSWORD"] = self.DATABASE_CONFIG[db_name]["password"]
         return env
+
+    @classmethod
+    def get_connection_kwargs(cls, db_name: str) -> Dict:
+        """
+        Get the psycopg2 connection arguments for the provided database name.
+        """
+        db_config = cls.DATABASE_CONFIG[db_name]
+        return {
+            "host": db_config["host"],
+            "port": 5432,
+            "user": db_config["username"],
+            "password": db_config["password"],
+            "dbname": db_config["dbname"],
+        }
@@ -0,0 +1,637 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import time
+from contextlib import closing
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from functools import partial
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import psycopg2
+from psycopg2 import sql
+
+# Values of --compress, a method with an optional level or just a gzip level
+COMPRESS_PATTERN = re.compile(
+    r"^(?:(?P<method>none|gzip|lz4|zstd)(?::(?P<level>\d+))?|(?P<gzip_level>\d))$"
+)
+# Compression levels pg_dump accepts per method, none takes no level
+COMPRESS_LEVELS = {"gzip": range(0, 10), "lz4": range(1, 13), "zstd": range(1, 23)}
+# Compression methods pg_dump supports from this major version on
+COMPRESS_MIN_VERSIONS = {"lz4": 16, "zstd": 16}
+# Rough share of the table data left in a compressed dump, only used for the size estimate
+COMPRESS_RATIOS = {"none": 1.0, "gzip": 0.3, "lz4": 0.45, "zstd": 0.25}
+# Schema, name, visibility on the search path, total size and size without indexes of the tables of a
+# database, largest first
+TABLE_SIZES_QUERY = """
+    SELECT n.nspname, c.relname, pg_table_is_visible(c.oid), pg_total_relation_size(c.oid),
+        pg_total_relation_size(c.oid) - pg_indexes_size(c.oid)
+    FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+    WHERE c.relkind IN ('r', 'p') AND n.nspname NOT IN ('pg_catalog', 'information_schema')
+    ORDER BY 4 DESC
+"""
+# Arguments making pg_restore drop the restored tables first, rather than all tables of the target
+RESTORE_CLEAN_ARGS = ["--clean", "--if-exists"]
+# Session settings of the restore and maintenance connections, passed to libpq through PGOPTIONS
+RESTORE_SESSION_OPTIONS = "-c maintenance_work_mem={} -c synchronous_commit=off"
+# Bytes copied from pg_dump to pg_restore at once, and between two progress reports
+STREAM_CHUNK_SIZE = 2**20
+STREAM_PROGRESS_INTERVAL = 64 * 2**20
+# Number of tables listed by --dry-run
+DRY_RUN_TABLES = 10
+DRY_RUN_LARGEST_TABLES = "Largest tables of {}:"
+DRY_RUN_SUMMARY = (
+    "{} tables take {} with indexes, {} of it is dumped as table data. "
+    "Estimated dump size with {} compression: {}."
+)
+
+
+def update_checksum(digest, path: str) -> None:
+    """
+    Feed the content of a file into a hash object in chunks.
+    """
+    with open(path, "rb") as file:
+        for chunk in iter(partial(file.read, 2**20), b""):
+            digest.update(chunk)
+
+
+def file_checksum(path: str) -> str:
+    """
+    Return the SHA-256 of a file.
+    """
+    digest = hashlib.sha256()
+    update_checksum(digest, path)
+    return digest.hexdigest()
+
+
+def format_size(size: float) -> str:
+    """
+    Format a number of bytes for humans, e.g. 1.5 GiB.
+    """
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TiB"
+
+
+def get_pg_dump_version() -> int:
+    """
+    Return the major version of the installed pg_dump, or 0 if it is not installed.
+    """
+    try:
+        output = subprocess.check_output(["pg_dump", "--version"], text=True)
+    except (OSError, subprocess.CalledProcessError):
+        return 0
+    match = re.search(r"\) (\d+)", output)
+    return int(match[1]) if match else 0
+
+
+def is_valid_compress(compress: str) -> bool:
+    """
+    Return whether a --compress value is a known method with a level pg_dump accepts for that method.
+    """
+    match = COMPRESS_PATTERN.match(compress)
+    if not match:
+        return False
+    return match["level"] is None or int(match["level"]) in COMPRESS_LEVELS.get(
+        match["method"], ()
+    )
+
+
+def get_compress_args(compress: Optional[str]) -> List[str]:
+    """
+    Return the pg_dump arguments for a --compress value, pg_dump compresses with gzip without them.
+    """
+    match = COMPRESS_PATTERN.match(compress or "")
+    if not match:
+        return []
+    method, level = match["method"] or "gzip", match["level"] or match["gzip_level"]
+    if method == "none":
+        return ["--compress=0"]
+    if method == "gzip":
+        return [f"--compress={level}"] if level else []
+    return [f"--compress={method}:{level}" if level else f"--compress={method}"]
+
+
+def get_compress_method(compress: Optional[str]) -> str:
+    """
+    Return the compression method of a --compress value, a level of 0 means no compression.
+    """
+    match = COMPRESS_PATTERN.match(compress or "")
+    if not match:
+        return "gzip"
+    if "0" in (match["level"], match["gzip_level"]):
+        return "none"
+    return match["method"] or "gzip"
+
+
+def get_table_sizes(connection_kwargs: Dict) -> List[Tuple[str, str, bool, int, int]]:
+    """
+    Return the schema, name, visibility, total size and size without indexes of every table of a database,
+    largest first.
+    """
+    with closing(psycopg2.connect(**connection_kwargs)) as connection:
+        with connection.cursor() as cursor:
+            cursor.execute(TABLE_SIZES_QUERY)
+            return cursor.fetchall()
+
+
+def matches_table_pattern(pattern: str, schema: str, name: str, visible: bool) -> bool:
+    """
+    Return whether a table matches a pg_dump table pattern.
+
+    Like pg_dump, unquoted text is folded to lower case, `*` and `?` are wildcards, other characters are
+    regular expression syntax and a dot separates the schema from the table name. Double quoted text keeps its
+    case and is matched literally. A pattern without a schema only matches tables visible on the search path.
+    """
+    parts = [""]
+    in_quotes = False
+    for token in re.findall(r'""|.', pattern, re.DOTALL):
+        if token == '""':
+            # An escaped double quote inside quotes, an empty quoted string outside them
+            parts[-1] += '"' if in_quotes else ""
+        elif token == '"':
+            in_quotes = not in_quotes
+        elif in_quotes:
+            parts[-1] += re.escape(token)
+        elif token == ".":
+            parts.append("")
+        else:
+            parts[-1] += {"*": ".*", "?": ".", "$": r"\$"}.get(token, token.lower())
+    if len(parts) == 1:
+        return visible and re.fullmatch(f"(?:{parts[0]})", name) is not None
+    return (
+        re.fullmatch(f"(?:{parts[-2]})", schema) is not None
+        and re.fullmatch(f"(?:{parts[-1]})", name) is not None
+    )
+
+
+def describe_dump_size(
+    source: str,
+    table_sizes: List[Tuple[str, str, bool, int, int]],
+    table_args: Sequence[str],
+    compress: Optional[str],
+) -> List[str]:
+    """
+    Report the largest tables of the source and estimate the size of the dump from the table sizes.
+
+    Indexes are rebuilt on restore rather than dumped, so only the table data of the selected tables counts
+    towards the estimate. The compression ratios are rough averages for text-heavy data.
+
+    :param source: The source database.
+    :param table_sizes: The table sizes of the source from `get_table_sizes`.
+    :param table_args: The pg_dump arguments selecting the tables and table data to dump.
+    :param compress: The --compress value.
+    :return: The lines of the report.
+    """
+    included = [
+        arg.removeprefix("--table=") for arg in table_args if arg.startswith("--table=")
+    ]
+    excluded = [
+        arg.removeprefix("--exclude-table-data=")
+        for arg in table_args
+        if arg.startswith("--exclude-table-data=")
+    ]
+    table_sizes = [
+        (table, total_size, data_size)
+        for *table, total_size, data_size in table_sizes
+        if not included
+        or any(matches_table_pattern(pattern, *table) for pattern in included)
+    ]
+    data_size = sum(
+        data_size
+        for table, _, data_size in table_sizes
+        if not any(matches_table_pattern(pattern, *table) for pattern in excluded)
+    )
+    method = get_compress_method(compress)
+    return [
+        DRY_RUN_LARGEST_TABLES.format(source),
+        *(
+            f"\t- {name}: {format_size(total_size)}"
+            for (_, name, _), total_size, _ in table_sizes[:DRY_RUN_TABLES]
+        ),
+        DRY_RUN_SUMMARY.format(
+            len(table_sizes),
+            format_size(sum(total_size for _, total_size, _ in table_sizes)),
+            format_size(data_size),
+            method,
+            format_size(data_size * COMPRESS_RATIOS[method]),
+        ),
+    ]
+
+
+def get_tuned_env(env: Dict, maintenance_work_mem: str) -> Dict:
+    """
+    Return a copy of a libpq environment with the session settings of the restore and maintenance.
+
+    The sessions build indexes with a larger maintenance_work_mem and do not wait for the WAL to be flushed on
+    commit, a restore that is cut short is rerun anyway.
+    """
+    options = RESTORE_SESSION_OPTIONS.format(maintenance_work_mem)
+    return {**env, "PGOPTIONS": " ".join(filter(None, [env.get("PGOPTIONS"), options]))}
+
+
+def get_maintenance_phases(
+    db_config: Dict[str, str], jobs: int, vacuum: bool
+) -> Dict[str, List[str]]:
+    """
+    Generate the maintenance run on a database after the restore.
+
+    A restored database has no planner statistics, vacuumdb analyzes (and with `vacuum` also vacuums) the
+    tables in parallel using one connection per job.
+    """
+    command = (
+        f"vacuumdb {'--analyze' if vacuum else '--analyze-only'} --jobs={jobs} --host={db_config['host']} "
+        f"--port=5432 --username={db_config['username']} --dbname={db_config['dbname']}"
+    )
+    return {"Vacuum" if vacuum else "Analyze": [command]}
+
+
+def get_stream_args(
+    source_config: Dict[str, str],
+    target_config: Dict[str, str],
+    table_args: Sequence[str] = (),
+    compress: Optional[str] = None,
+    clean: bool = False,
+) -> Tuple[List[str], List[str]]:
+    """
+    Generate the arguments of the pg_dump and pg_restore processes connected by the stream.
+
+    With `clean` pg_restore drops the restored tables before recreating them.
+    """
+    dump_args = [
+        "pg_dump",
+        "-Fc",
+        f"--host={source_config['host']}",
+        f"--username={source_config['username']}",
+        f"--dbname={source_config['dbname']}",
+        *get_compress_args(compress),
+        *table_args,
+    ]
+    restore_args = [
+        "pg_restore",
+        "--no-owner",
+        *(RESTORE_CLEAN_ARGS if clean else []),
+        f"--host={target_config['host']}",
+        "--port=5432",
+        f"--username={target_config['username']}",
+        f"--dbname={target_config['dbname']}",
+    ]
+    return dump_args, restore_args
+
+
+def stream_dump(
+    dump_args: List[str],
+    restore_args: List[str],
+    source_env: Dict,
+    target_env: Dict,
+    on_progress: Callable[[int], None],
+) -> Tuple[bool, Optional[int]]:
+    """
+    Pipe the output of pg_dump into pg_restore.
+
+    The dump is copied in chunks so both run at the same time and nothing is written to disk. The
+    stdin of pg_restore is buffered, so every chunk is written completely.
+
+    :param on_progress: Called with the number of bytes copied so far, every STREAM_PROGRESS_INTERVAL bytes
+        and at the end.
+    :return: Whether the dump was streamed completely and the exit code of pg_restore, None if it did not
+        start.
+    """
+    copied = reported = 0
+    dump = restore = None
+    try:
+        with subprocess.Popen(
+            dump_args, stdout=subprocess.PIPE, env=source_env
+        ) as dump, subprocess.Popen(
+            restore_args, stdin=subprocess.PIPE, env=target_env
+        ) as restore:
+            for chunk in iter(partial(dump.stdout.read, STREAM_CHUNK_SIZE), b""):
+                restore.stdin.write(chunk)
+                copied += len(chunk)
+                if copied - reported >= STREAM_PROGRESS_INTERVAL:
+                    on_progress(copied)
+                    reported = copied
+    except OSError:
+        # pg_restore exited early (a broken pipe, pg_dump stops as well once its output is closed) or one
+        # of them could not be started, the caller falls back to a dump file
+        streamed = False
+    else:
+        streamed = dump.returncode == 0
+
+    if copied != reported:
+        on_progress(copied)
+    return streamed, restore.returncode if restore else None
+
+
+class DumpCache:
+    """
+    Local cache of dumps, keyed by the source database, the dump options and the time of the dump.
+
+    A checksum file is written next to a dump once it completed, dumps without a matching checksum are never
+    reused.
+    """
+
+    TIMESTAMP_FORMAT = "%Y%m%dT%H%M%S"
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    @staticmethod
+    def get_key(jobs: Optional[int], table_args: Sequence[str]) -> str:
+        """
+        Return a short key identifying the format and the tables of a dump.
+        """
+        options = " ".join(["directory" if jobs else "custom", *table_args])
+        return hashlib.sha256(options.encode()).hexdigest()[:8]
+
+    def new_path(self, source: str, key: str) -> str:
+        """
+        Return the path for a new dump of the source database.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        timestamp = datetime.now().strftime(self.TIMESTAMP_FORMAT)
+        return os.path.join(self.directory, f"{source}-{key}-{timestamp}.dump")
+
+    def get_dumps(self, source: str, key: str) -> List[Tuple[datetime, str]]:
+        """
+        Return the creation time and path of the cached dumps of the source database, newest first.
+        """
+        if not os.path.isdir(self.directory):
+            return []
+        prefix = f"{source}-{key}-"
+        dumps = []
+        for name in os.listdir(self.directory):
+            if name.startswith(prefix) and name.endswith(".dump"):
+                try:
+                    created_at = datetime.strptime(
+                        name.removeprefix(prefix).removesuffix(".dump"),
+                        self.TIMESTAMP_FORMAT,
+                    )
+                except ValueError:
+                    continue
+                dumps.append((created_at, os.path.join(self.directory, name)))
+        return sorted(dumps, reverse=True)
+
+    def find(self, source: str, key: str, max_age: int) -> Optional[str]:
+        """
+        Return the newest complete dump of the source database that is at most `max_age` minutes old.
+        """
+        cutoff = datetime.now() - timedelta(minutes=max_age)
+        for created_at, path in self.get_dumps(source, key):
+            if created_at < cutoff:
+                break
+            if self.verify(path):
+                return path
+        return None
+
+    @staticmethod
+    def checksum(path: str) -> str:
+        """
+        Return the SHA-256 of a dump file, or of all files of a directory format dump.
+        """
+        digest = hashlib.sha256()
+        if os.path.isdir(path):
+            files = sorted(os.listdir(path))
+            paths = [os.path.join(path, name) for name in files]
+        else:
+            files, paths = [os.path.basename(path)], [path]
+        for name, file_path in zip(files, paths):
+            digest.update(name.encode())
+            update_checksum(digest, file_path)
+        return digest.hexdigest()
+
+    def store(self, path: str) -> None:
+        """
+        Mark a dump as complete by writing its checksum next to it.
+        """
+        with open(f"{path}.sha256", "w", encoding="utf-8") as file:
+            file.write(self.checksum(path))
+
+    def verify(self, path: str) -> bool:
+        """
+        Check that a dump is complete and unchanged since it was stored.
+        """
+        try:
+            with open(f"{path}.sha256", encoding="utf-8") as file:
+                expected = file.read().strip()
+        except FileNotFoundError:
+            return False
+        return os.path.exists(path) and self.checksum(path) == expected
+
+    def evict(self, source: str, key: str, keep: int) -> None:
+        """
+        Delete all but the `keep` newest dumps of the source database.
+        """
+        for _, path in self.get_dumps(source, key)[keep:]:
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            elif os.path.exists(path):
+                os.remove(path)
+            if os.path.exists(f"{path}.sha256"):
+                os.remove(f"{path}.sha256")
+
+
+class MediaSync:
+    """
+    Incremental, parallel copy of the media files of another environment into a local media directory.
+
+    A file is copied unless the local copy has the same size and SHA-256. A manifest in the local media
+    directory remembers which files were in sync, files that did not change on either side since are skipped
+    without being read, so a re-run only transfers the changes.
+    """
+
+    MANIFEST_NAME = ".media_manifest.json"
+
+    def __init__(self, source_root: str, target_root: str, workers: int):
+        self.source_root = source_root
+        self.target_root = target_root
+        self.workers = workers
+
+    @property
+    def manifest_path(self) -> str:
+        """
+        Return the path of the manifest of the local media directory.
+        """
+        return os.path.join(self.target_root, self.MANIFEST_NAME)
+
+    def load_manifest(self) -> Dict[str, Dict]:
+        """
+        Return the manifest of the previous sync, or an empty one.
+        """
+        try:
+            with open(self.manifest_path, encoding="utf-8") as file:
+                return json.load(file)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def save_manifest(self, manifest: Dict[str, Dict]) -> None:
+        """
+        Write the manifest of the current sync.
+        """
+        os.makedirs(self.target_root, exist_ok=True)
+        with open(self.manifest_path, "w", encoding="utf-8") as file:
+            json.dump(manifest, file)
+
+    def get_source_files(self) -> Dict[str, os.stat_result]:
+        """
+        Return the path relative to the source media directory and the stat of every media file.
+        """
+        files = {}
+        for directory, _, names in os.walk(self.source_root):
+            for name in names:
+                path = os.path.join(directory, name)
+                relative_path = os.path.relpath(path, self.source_root)
+                if relative_path != self.MANIFEST_NAME:
+                    files[relative_path] = os.stat(path)
+        return files
+
+    def sync_file(
+        self, relative_path: str, stat: os.stat_result, entry: Optional[Dict]
+    ) -> Tuple[Dict, bool]:
+        """
+        Copy a media file unless the local copy is already in sync.
+
+        :param relative_path: Path of the file relative to the media directories.
+        :param stat: Stat of the source file.
+        :param entry: Manifest entry of the file from the previous sync.
+        :return: The manifest entry of the file and whether it was copied.
+        """
+        source_path = os.path.join(self.source_root, relative_path)
+        target_path = os.path.join(self.target_root, relative_path)
+        entry_for = partial(dict, size=stat.st_size, mtime=stat.st_mtime)
+
+        try:
+            target_stat = os.stat(target_path)
+        except FileNotFoundError:
+            target_stat = None
+
+        if target_stat and target_stat.st_size == stat.st_size:
+            if entry == entry_for(target_mtime=target_stat.st_mtime):
+                return entry, False
+            if file_checksum(source_path) == file_checksum(target_path):
+                return entry_for(target_mtime=target_stat.st_mtime), False
+
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        # Copy next to the target first, so an interrupted copy never leaves a truncated file behind
+        temporary_path = f"{target_path}.part"
+        try:
+            shutil.copyfile(source_path, temporary_path)
+            os.replace(temporary_path, target_path)
+        except OSError:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+            raise
+        return entry_for(target_mtime=os.stat(target_path).st_mtime), True
+
+    def sync(self) -> Dict[str, int]:
+        """
+        Copy the changed media files with a pool of threads and update the manifest.
+
+        :return: The number of copied, skipped and failed files and the number of copied bytes.
+        """
+        manifest = self.load_manifest()
+        new_manifest = {}
+        stats = {"copied": 0, "skipped": 0, "failed": 0, "bytes": 0}
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {
+                executor.submit(
+                    self.sync_file, relative_path, stat, manifest.get(relative_path)
+                ): (relative_path, stat)
+                for relative_path, stat in self.get_source_files().items()
+            }
+            for future in as_completed(futures):
+                relative_path, stat = futures[future]
+                try:
+                    entry, copied = future.result()
+                except OSError:
+                    stats["failed"] += 1
+                    continue
+                new_manifest[relative_path] = entry
+                if copied:
+                    stats["copied"] += 1
+                    stats["bytes"] += stat.st_size
+                else:
+                    stats["skipped"] += 1
+        self.save_manifest(new_manifest)
+        return stats
+
+
+class Anonymizer:
+    """
+    Set-based anonymisation of the personal data in a restored database.
+
+    Each rule sets columns of a table to SQL expressions. A table is updated in chunks of primary keys, one
+    UPDATE per chunk, so no statement holds all rows at once. The tables are anonymized in parallel, each
+    with its own connection.
+    """
+
+    def __init__(
+        self,
+        connection_kwargs: Dict,
+        rules: Dict[str, Dict[str, str]],
+        chunk_size: int,
+        workers: int,
+    ):
+        self.connection_kwargs = connection_kwargs
+        self.rules = rules
+        self.chunk_size = chunk_size
+        self.workers = workers
+
+    @staticmethod
+    def get_update(table: str, columns: Dict[str, str]) -> sql.Composed:
+        """
+        Return the UPDATE applying the rule of a table to a range of primary keys.
+        """
+        assignments = sql.SQL(", ").join(
+            sql.SQL("{} = {}").format(sql.Identifier(column), sql.SQL(expression))
+            for column, expression in columns.items()
+        )
+        return sql.SQL("UPDATE {} SET {} WHERE id BETWEEN %s AND %s").format(
+            sql.Identifier(table), assignments
+        )
+
+    def anonymize_table(self, table: str, columns: Dict[str, str]) -> Tuple[int, float]:
+        """
+        Anonymize a table chunk by chunk, committing every chunk.
+
+        :return: The number of updated rows and how long it took.
+        """
+        start = time.monotonic()
+        rows = 0
+        update = self.get_update(table, columns)
+        with closing(psycopg2.connect(**self.connection_kwargs)) as connection:
+            connection.autocommit = True
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    sql.SQL("SELECT min(id), max(id) FROM {}").format(
+                        sql.Identifier(table)
+                    )
+                )
+                first_id, last_id = cursor.fetchone()
+                if first_id is not None:
+                    for chunk_start in range(first_id, last_id + 1, self.chunk_size):
+                        cursor.execute(
+                            update, [chunk_start, chunk_start + self.chunk_size - 1]
+                        )
+                        rows += cursor.rowcount
+        return rows, time.monotonic() - start
+
+    def anonymize(self) -> Dict[str, Tuple[int, float]]:
+        """
+        Anonymize all tables of the rules with a pool of threads.
+
+        :return: The number of updated rows and the duration per table.
+        """
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {
+                executor.submit(self.anonymize_table, table, columns): table
+                for table, columns in self.rules.items()
+            }
+            return {
+                futures[future]: future.result() for future in as_completed(futures)
+            }
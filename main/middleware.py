@@ -1,21 +1,106 @@
+from typing import Optional
+
+from django.conf import settings
+from django.utils.functional import cached_property
+
 from main.models import Notification
+from main.routers import replica_reads, wrote_to_primary
+
+PRIMARY_PIN_COOKIE_NAME = "pin_primary"
+
+
+class UnreadNotifications:
+    """
+    Lazy accessor for the unread notifications of the requesting user.
+
+    Nothing is looked up until a template touches `count` or `latest`, and each value is resolved at most
+    once per request.
+    """
+
+    def __init__(self, request):
+        self._request = request
+
+    @cached_property
+    def _user_id(self) -> Optional[int]:
+        """
+        Return the primary key of the requesting user, or None for anonymous users.
+        """
+        user = self._request.user
+        return user.pk if user.is_authenticated else None
+
+    @cached_property
+    def latest(self) -> list:
+        """
+        Return the newest unread notifications of the user, bounded by NOTIFICATION_DROPDOWN_LIMIT.
+        """
+        if self._user_id is None:
+            return []
+        return Notification.objects.latest_unread(self._user_id)
+
+    @cached_property
+    def count(self) -> int:
+        """
+        Return the (capped) number of unread notifications of the user.
+
+        The latest notifications are resolved first since the dropdown needs them anyway, and a dropdown
+        that is not full already tells us the count.
+        """
+        if self._user_id is None:
+            return 0
+        return Notification.objects.unread_count(self._user_id, latest=self.latest)
+
+    def __bool__(self) -> bool:
+        return bool(self.count)
+
+    def __iter__(self):
+        return iter(self.latest)
 
 
 # pylint: disable=too-few-public-methods
 class NotificationMiddleware:
     """
-    Middleware to attach unread notifications to every authenticated user's request object.
+    Middleware to attach a lazy accessor for the unread notifications to every request object.
     """
 
     def __init__(self, get_response):
         self.get_response = get_response
 
     def __call__(self, request):
-        if request.user.is_authenticated:
-            unread_notifications = Notification.objects.filter(
-                user=request.user, is_read=False
-            )
-            request.unread_notifications = unread_notifications
+        request.unread_notifications = UnreadNotifications(request)
 
         response = self.get_response(request)
         return response
+
+
+# pylint: disable=too-few-public-methods
+class ReplicaRoutingMiddleware:
+    """
+    Middleware letting safe requests read the routed models from the replica.
+
+    Requests with an unsafe method read from the primary. A request that writes sets a short-lived cookie so
+    the client keeps reading from the primary until the replica caught up with the write.
+    """
+
+    safe_methods = ("GET", "HEAD", "OPTIONS", "TRACE")
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        pinned = (
+            request.method not in self.safe_methods
+            or PRIMARY_PIN_COOKIE_NAME in request.COOKIES
+        )
+        with replica_reads(pinned=pinned):
+            response = self.get_response(request)
+            wrote = wrote_to_primary()
+
+        if wrote:
+            response.set_cookie(
+                PRIMARY_PIN_COOKIE_NAME,
+                "1",
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:33
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # The index is built concurrently so the notifications table stays writable meanwhile
+    atomic = False
+
+    dependencies = [
+        ("main", "0006_socialmedialink"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="notification",
+            index=models.Index(
+                condition=models.Q(("is_read", False)),
+                fields=["user", "-created_at"],
+                name="notification_unread_user_idx",
+            ),
+        ),
+    ]
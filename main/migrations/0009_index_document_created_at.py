@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0008_outgoingemail"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="privacypolicy",
+            name="created_at",
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name="termsandconditions",
+            name="created_at",
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+    ]
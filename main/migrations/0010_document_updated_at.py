@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:50
+
+from django.db import migrations, models
+
+
+def copy_created_at(apps, schema_editor):
+    """
+    Start the existing versions with their creation time as their last update.
+    """
+    for model_name in ("PrivacyPolicy", "TermsAndConditions"):
+        apps.get_model("main", model_name).objects.update(
+            updated_at=models.F("created_at")
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0009_index_document_created_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="privacypolicy",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name="termsandconditions",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(copy_created_at, migrations.RunPython.noop),
+    ]
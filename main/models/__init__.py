@@ -6,6 +6,7 @@ from .business import (
     AuditLogConfig,
     SocialMediaLink,
 )
+from .outbox import OutgoingEmail
 
 __all__ = [
     "Notification",
@@ -14,4 +15,5 @@ __all__ = [
     "Contact",
     "AuditLogConfig",
     "SocialMediaLink",
+    "OutgoingEmail",
 ]
@@ -2,16 +2,52 @@ from django.apps import apps
 from django.db import models
 from auditlog.registry import auditlog
 
+from main.cache import tiered_cache
 from main.consts import ContactStatus
 
 
+class CurrentVersionManager(models.Manager):
+    """
+    Manager for append-only documents where the most recently created version is the current one.
+    """
+
+    @property
+    def cache_key(self) -> str:
+        """
+        Return the cache key of the current version of the document.
+        """
+        return f"{self.model._meta.label_lower}:current"
+
+    def current(self) -> models.Model:
+        """
+        Return the current version of the document, served from the cache when possible.
+
+        The shared cached version does not expire, it is dropped whenever a version is saved or deleted.
+
+        :raises DoesNotExist: If no version of the document exists.
+        :return: The most recently created version
+        """
+        return tiered_cache.get_or_set(
+            self.cache_key, lambda: self.latest("created_at"), timeout=None
+        )
+
+    def invalidate_cache(self) -> None:
+        """
+        Drop the cached current version of the document.
+        """
+        tiered_cache.delete(self.cache_key)
+
+
 class TermsAndConditions(models.Model):
     """
     Model for the Terms and Conditions
     """
 
     terms = models.TextField()
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = CurrentVersionManager()
 
     def __str__(self):
         return f"Terms And Conditions created at {self.created_at}"
@@ -27,7 +63,10 @@ class PrivacyPolicy(models.Model):
     """
 
     policy = models.TextField()
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = CurrentVersionManager()
 
     def __str__(self):
         return f"Privacy Policy created at {self.created_at}"
@@ -93,6 +132,34 @@ class AuditLogConfig(models.Model):
             pass  # Model not found, handle appropriately
 
 
+SOCIAL_MEDIA_LINKS_CACHE_KEY = "social_media_links"
+
+
+class SocialMediaLinkManager(models.Manager):
+    """
+    Manager for the SocialMediaLink model with a cached list of all links for the footer.
+    """
+
+    def cached_all(self) -> list:
+        """
+        Return all social media links, served from the cache when possible.
+
+        The shared cached list does not expire, it is dropped whenever a link is saved or deleted.
+
+        :return: A list of social media links
+        """
+        return tiered_cache.get_or_set(
+            SOCIAL_MEDIA_LINKS_CACHE_KEY, lambda: list(self.all()), timeout=None
+        )
+
+    @staticmethod
+    def invalidate_cache() -> None:
+        """
+        Drop the cached list of social media links.
+        """
+        tiered_cache.delete(SOCIAL_MEDIA_LINKS_CACHE_KEY)
+
+
 class SocialMediaLink(models.Model):
     """
     Model to store social media links for the organization.
@@ -104,5 +171,7 @@ class SocialMediaLink(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = SocialMediaLinkManager()
+
     def __str__(self):
         return f"{self.platform_name} link"
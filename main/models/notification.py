@@ -1,8 +1,212 @@
-from django.db import models
+from functools import partial
+from itertools import islice
+from typing import Iterable, Optional, Union
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import models, transaction
 from django.urls import reverse
+from django.utils import timezone
 
 from users.models import User
 
+UNREAD_COUNT_CACHE_KEY = "notifications:unread_count:{}"
+LATEST_UNREAD_CACHE_KEY = "notifications:latest_unread:{}"
+
+
+class NotificationManager(models.Manager):
+    """
+    Manager for the Notification model with cached unread lookups for the navbar badge.
+    """
+
+    def unread(self, user_id: int) -> models.QuerySet:
+        """
+        Return the unread notifications of a user.
+
+        :param user_id: The primary key of the user.
+        :return: QuerySet of unread notifications
+        """
+        return self.filter(user_id=user_id, is_read=False)
+
+    def unread_count(self, user_id: int, latest: Optional[list] = None) -> int:
+        """
+        Return the number of unread notifications of a user, served from the cache when possible.
+
+        The count is capped at NOTIFICATION_BADGE_LIMIT so that a cold cache costs a bounded query, and
+        no query is needed at all when the given latest unread notifications are fewer than the
+        dropdown holds.
+
+        :param user_id: The primary key of the user.
+        :param latest: The result of `latest_unread` for the user, if already known.
+        :return: The (capped) number of unread notifications
+        """
+        key = UNREAD_COUNT_CACHE_KEY.format(user_id)
+        count = cache.get(key)
+        if count is None:
+            if (
+                latest is not None
+                and len(latest) < settings.NOTIFICATION_DROPDOWN_LIMIT
+            ):
+                count = len(latest)
+            else:
+                count = self.unread(user_id)[
+                    : settings.NOTIFICATION_BADGE_LIMIT
+                ].count()
+            self.cache_after_commit(key, count)
+        return count
+
+    def latest_unread(self, user_id: int) -> list:
+        """
+        Return the newest NOTIFICATION_DROPDOWN_LIMIT unread notifications of a user, served from the cache
+        when possible.
+
+        :param user_id: The primary key of the user.
+        :return: A list of notifications, newest first
+        """
+        key = LATEST_UNREAD_CACHE_KEY.format(user_id)
+        notifications = cache.get(key)
+        if notifications is None:
+            notifications = list(
+                self.unread(user_id).order_by("-created_at")[
+                    : settings.NOTIFICATION_DROPDOWN_LIMIT
+                ]
+            )
+            self.cache_after_commit(key, notifications)
+        return notifications
+
+    @staticmethod
+    def cache_after_commit(key: str, value) -> None:
+        """
+        Cache a value read from the database once the current transaction commits.
+
+        A value read inside a transaction may include its uncommitted changes, which must not be served to
+        other requests if it rolls back. A read racing the commit of another transaction can still cache a
+        stale value, NOTIFICATION_CACHE_TIMEOUT bounds how long it is served.
+
+        :param key: The cache key.
+        :param value: The value to cache.
+        """
+        transaction.on_commit(
+            partial(cache.set, key, value, settings.NOTIFICATION_CACHE_TIMEOUT)
+        )
+
+    @staticmethod
+    def increment_unread_cache(user_id: int) -> None:
+        """
+        Account for a new unread notification of a user in the cache.
+
+        :param user_id: The primary key of the user.
+        """
+        try:
+            cache.incr(UNREAD_COUNT_CACHE_KEY.format(user_id))
+        except ValueError:
+            pass  # Nothing cached yet, the next read will count from the database
+        cache.delete(LATEST_UNREAD_CACHE_KEY.format(user_id))
+
+    @staticmethod
+    def invalidate_unread_cache(*user_ids: int) -> None:
+        """
+        Drop the cached unread count and latest notifications of the given users.
+
+        :param user_ids: The primary keys of the users.
+        """
+        keys = []
+        for user_id in user_ids:
+            keys.append(UNREAD_COUNT_CACHE_KEY.format(user_id))
+            keys.append(LATEST_UNREAD_CACHE_KEY.format(user_id))
+        cache.delete_many(keys)
+
+    def mark_as_read(
+        self, pk: int, link: Optional[str] = None, user_id: Optional[int] = None
+    ) -> bool:
+        """
+        Mark a notification as read with a single conditional UPDATE.
+
+        The cached unread values of the owner are dropped afterwards. When the owner is passed as `user_id`
+        only a notification of that user is marked, otherwise the owner is looked up after the UPDATE.
+
+        :param pk: The primary key of the notification.
+        :param link: If given, the notification is only marked when its link matches.
+        :param user_id: The primary key of the owner of the notification, if known.
+        :return: True if an unread notification was marked as read, False otherwise
+        """
+        notifications = self.filter(pk=pk, is_read=False)
+        if link is not None:
+            notifications = notifications.filter(link=link)
+        if user_id is not None:
+            notifications = notifications.filter(user_id=user_id)
+        if not notifications.update(is_read=True, updated_at=timezone.now()):
+            return False
+
+        if user_id is None:
+            user_id = self.filter(pk=pk).values_list("user_id", flat=True).get()
+        transaction.on_commit(partial(self.invalidate_unread_cache, user_id))
+        return True
+
+    def mark_all_as_read(self, user_id: int) -> int:
+        """
+        Mark every unread notification of a user as read in one UPDATE.
+
+        :param user_id: The primary key of the user.
+        :return: The number of notifications marked as read
+        """
+        marked = self.unread(user_id).update(is_read=True, updated_at=timezone.now())
+        if marked:
+            transaction.on_commit(partial(self.invalidate_unread_cache, user_id))
+        return marked
+
+    # pylint: disable=too-many-arguments,too-many-positional-arguments,redefined-builtin
+    def bulk_notify(
+        self,
+        users: Union[models.QuerySet, Iterable],
+        title: str,
+        message: str,
+        link: str,
+        type: str = "info",
+        batch_size: Optional[int] = None,
+    ) -> int:
+        """
+        Create the same notification for many users with one INSERT per batch.
+
+        A queryset of users is streamed with `iterator()` so that only the ids of one batch are held in
+        memory at a time. `bulk_create` does not send signals, so the cached unread values of every
+        notified user are dropped once each batch is committed.
+
+        :param users: A queryset of users, or an iterable of users or user ids.
+        :param title: The title of the notification.
+        :param message: The message content of the notification.
+        :param link: The URL to which the notification redirects.
+        :param type: The type of the notification.
+        :param batch_size: Number of notifications inserted per batch, defaults to NOTIFICATION_BULK_BATCH_SIZE.
+        :return: The number of notifications created
+        """
+        batch_size = batch_size or settings.NOTIFICATION_BULK_BATCH_SIZE
+        if isinstance(users, models.QuerySet):
+            user_ids = users.values_list("pk", flat=True).iterator(
+                chunk_size=batch_size
+            )
+        else:
+            user_ids = (getattr(user, "pk", user) for user in users)
+
+        created = 0
+        while batch := list(islice(user_ids, batch_size)):
+            self.bulk_create(
+                [
+                    self.model(
+                        user_id=user_id,
+                        title=title,
+                        message=message,
+                        link=link,
+                        type=type,
+                    )
+                    for user_id in batch
+                ],
+                batch_size=batch_size,
+            )
+            transaction.on_commit(partial(self.invalidate_unread_cache, *batch))
+            created += len(batch)
+        return created
+
 
 class Notification(models.Model):
     """
@@ -36,6 +240,18 @@ class Notification(models.Model):
     ]
     type = models.CharField(max_length=10, choices=TYPES, default="info")
 
+    objects = NotificationManager()
+
+    class Meta:
+        indexes = [
+            # Serves the unread notifications of a user, newest first, without touching read ones
+            models.Index(
+                fields=["user", "-created_at"],
+                condition=models.Q(is_read=False),
+                name="notification_unread_user_idx",
+            ),
+        ]
+
     def get_absolute_url(self) -> str:
         """
         Get the URL that allows users to mark the notification as read
@@ -50,12 +266,17 @@ class Notification(models.Model):
             kwargs={"notification_id": self.pk, "destination_url": self.link},
         )
 
-    def mark_as_read(self) -> None:
+    def mark_as_read(self) -> bool:
         """
         Mark the notification as read.
+
+        Only the read flag and the update time are written, without a full save.
+
+        :return: True if the notification was unread, False otherwise
         """
+        marked = Notification.objects.mark_as_read(self.pk, user_id=self.user_id)
         self.is_read = True
-        self.save()
+        return marked
 
     def __str__(self) -> str:
         return self.title
@@ -0,0 +1,89 @@
+from typing import Optional
+
+from django.conf import settings
+from django.core.mail import EmailMessage
+from django.db import models
+
+from main.consts import EmailStatus
+
+
+# pylint: disable=too-few-public-methods
+class OutgoingEmailManager(models.Manager):
+    """
+    Manager for the OutgoingEmail model.
+    """
+
+    def queue(
+        self,
+        subject: str,
+        message: str,
+        recipient_list: list[str],
+        from_email: Optional[str] = None,
+    ) -> list:
+        """
+        Queue an email for every recipient with a single INSERT. The emails are sent by the outbox drainer.
+
+        :param subject: Subject of the email.
+        :param message: Body of the email.
+        :param recipient_list: A list of recipient email addresses.
+        :param from_email: Sender's email address, defaults to DEFAULT_FROM_EMAIL.
+        :return: The queued emails
+        """
+        from_email = from_email or settings.DEFAULT_FROM_EMAIL
+        return self.bulk_create(
+            [
+                self.model(
+                    subject=subject,
+                    message=message,
+                    from_email=from_email,
+                    recipient=recipient,
+                )
+                for recipient in recipient_list
+            ],
+            batch_size=settings.EMAIL_OUTBOX_BATCH_SIZE,
+        )
+
+
+class OutgoingEmail(models.Model):
+    """
+    An email waiting in the outbox to be sent, or the record of one that was.
+    """
+
+    subject = models.CharField(max_length=255)
+    message = models.TextField()
+    from_email = models.CharField(max_length=255)
+    recipient = models.EmailField()
+    status = models.CharField(
+        max_length=15,
+        choices=EmailStatus.choices(),
+        default=EmailStatus.PENDING.value,
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    objects = OutgoingEmailManager()
+
+    def __str__(self) -> str:
+        return f"{self.subject} - {self.recipient}"
+
+    def as_message(self) -> EmailMessage:
+        """
+        Return the email as a message ready to be sent.
+        """
+        return EmailMessage(
+            self.subject, self.message, self.from_email, [self.recipient]
+        )
+
+    class Meta:
+        verbose_name = "Outgoing Email"
+        verbose_name_plural = "Outgoing Emails"
+        indexes = [
+            # Lets the drainer find pending emails without scanning the sent history
+            models.Index(
+                fields=["id"],
+                condition=models.Q(status=EmailStatus.PENDING.value),
+                name="outgoingemail_pending_idx",
+            ),
+        ]
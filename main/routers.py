@@ -0,0 +1,74 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+REPLICA_DB_ALIAS = "replica"
+
+# Reads outside of a request, e.g. in Celery tasks or management commands, always go to the primary
+_pinned_to_primary = ContextVar("pinned_to_primary", default=True)
+_wrote_to_primary = ContextVar("wrote_to_primary", default=False)
+
+
+@contextmanager
+def replica_reads(pinned: bool = False):
+    """
+    Context manager sending reads of the routed models to the replica until the first write.
+
+    :param pinned: Whether to read from the primary from the start.
+    """
+    pinned_token = _pinned_to_primary.set(pinned)
+    wrote_token = _wrote_to_primary.set(False)
+    try:
+        yield
+    finally:
+        _pinned_to_primary.reset(pinned_token)
+        _wrote_to_primary.reset(wrote_token)
+
+
+def wrote_to_primary() -> bool:
+    """
+    Return whether anything was written within the current `replica_reads` block.
+    """
+    return _wrote_to_primary.get()
+
+
+class ReplicaRouter:
+    """
+    Database router sending reads of the models in REPLICA_ROUTED_MODELS to the replica, if one is configured.
+
+    Any write pins the rest of the `replica_reads` block to the primary, so it reads its own writes even
+    when the replica lags behind.
+    """
+
+    def db_for_read(self, model, **hints) -> Optional[str]:
+        """
+        Return the replica for routed models unless reads are pinned to the primary.
+        """
+        if (
+            REPLICA_DB_ALIAS in settings.DATABASES
+            and not _pinned_to_primary.get()
+            and model._meta.label_lower in settings.REPLICA_ROUTED_MODELS
+        ):
+            return REPLICA_DB_ALIAS
+        return None
+
+    def db_for_write(self, model, **hints) -> Optional[str]:
+        """
+        Pin reads to the primary, which receives all writes.
+        """
+        _pinned_to_primary.set(True)
+        _wrote_to_primary.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints) -> Optional[bool]:
+        """
+        Allow relations between objects loaded from the primary and the replica, they hold the same data.
+        """
+        databases = {DEFAULT_DB_ALIAS, REPLICA_DB_ALIAS}
+        # pylint: disable=protected-access
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
@@ -0,0 +1,62 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from main.cache import invalidate_page_cache
+from main.models import Notification, SocialMediaLink, TermsAndConditions, PrivacyPolicy
+
+
+@receiver(post_save, sender=Notification)
+def update_unread_notification_cache(sender, instance, created, **kwargs) -> None:
+    """
+    Keep the cached unread notifications of the user in sync once the save is committed.
+
+    A new unread notification only bumps the cached count, any other change drops the cached values.
+    """
+    if created and instance.is_read:
+        return
+
+    if created:
+        callback = partial(
+            Notification.objects.increment_unread_cache, instance.user_id
+        )
+    else:
+        callback = partial(
+            Notification.objects.invalidate_unread_cache, instance.user_id
+        )
+    transaction.on_commit(callback)
+
+
+@receiver(post_delete, sender=Notification)
+def clear_unread_notification_cache(sender, instance, **kwargs) -> None:
+    """
+    Drop the cached unread notifications of the user once an unread notification is deleted.
+    """
+    if not instance.is_read:
+        transaction.on_commit(
+            partial(Notification.objects.invalidate_unread_cache, instance.user_id)
+        )
+
+
+@receiver(post_save, sender=SocialMediaLink)
+@receiver(post_delete, sender=SocialMediaLink)
+def clear_social_media_links_cache(sender, **kwargs) -> None:
+    """
+    Drop the cached social media links and the cached pages showing them once a link is saved or deleted.
+    """
+    transaction.on_commit(SocialMediaLink.objects.invalidate_cache)
+    transaction.on_commit(invalidate_page_cache)
+
+
+@receiver(post_save, sender=TermsAndConditions)
+@receiver(post_delete, sender=TermsAndConditions)
+@receiver(post_save, sender=PrivacyPolicy)
+@receiver(post_delete, sender=PrivacyPolicy)
+def clear_current_document_cache(sender, **kwargs) -> None:
+    """
+    Drop the cached current version of a document and the cached pages once a version is saved or deleted.
+    """
+    transaction.on_commit(sender.objects.invalidate_cache)
+    transaction.on_commit(invalidate_page_cache)
@@ -1,18 +1,96 @@
 import logging
 import smtplib
+from datetime import timedelta
 
-from celery import shared_task
-from django.core.mail import send_mail
+from celery import Task, shared_task
+from celery.signals import worker_process_shutdown
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+from django.db import transaction
+from django.db.models import F, QuerySet
+from django.utils import timezone
+from django_celery_results.models import GroupResult, TaskResult
+
+from main.consts import EmailStatus
+from main.models import Notification, OutgoingEmail
+from users.models import User
 
 logger = logging.getLogger("celery")
 
 
-@shared_task
+class CompactResultTask(Task):  # pylint: disable=abstract-method
+    """
+    A task whose stored result leaves out its call arguments.
+
+    The extended result of bulk tasks would otherwise repeat their whole recipient or user lists.
+    """
+
+    def before_start(self, task_id, args, kwargs):
+        # The django-db result backend stores these representations as the task arguments
+        self.request.argsrepr = "()"
+        self.request.kwargsrepr = "{}"
+
+
+# The SMTP connection of this worker process, opened on first use and kept open across tasks
+_email_connection: BaseEmailBackend | None = None
+
+
+def get_email_connection() -> BaseEmailBackend:
+    """
+    Return the open email connection of this worker process, opening it if needed.
+
+    :return: The email backend holding the connection.
+    """
+    global _email_connection  # pylint: disable=global-statement
+    if _email_connection is None:
+        connection = get_connection()
+        try:
+            connection.open()
+        except OSError:
+            connection.close()
+            raise
+        _email_connection = connection
+    return _email_connection
+
+
+@worker_process_shutdown.connect
+def close_email_connection(**kwargs) -> None:
+    """
+    Close the email connection of this worker process, if any.
+    """
+    global _email_connection  # pylint: disable=global-statement
+    if _email_connection is not None:
+        try:
+            _email_connection.close()
+        finally:
+            _email_connection = None
+
+
+def send_messages(messages: list[EmailMessage]) -> int:
+    """
+    Send email messages over the connection of this worker process.
+
+    A connection dropped by the server since the last task is reopened once before giving up.
+
+    :param messages: The email messages to send.
+    :return: The number of messages sent.
+    """
+    try:
+        return get_email_connection().send_messages(messages)
+    except smtplib.SMTPServerDisconnected:
+        close_email_connection()
+        return get_email_connection().send_messages(messages)
+
+
+# Fire-and-forget: the outcome is logged, and storing results would persist every email body
+@shared_task(ignore_result=True)
 def send_email_task(
     subject: str, message: str, from_email: str, recipient_list: list[str]
 ) -> bool:
     """
-    A Celery task to send an email.
+    A Celery task to send an email right away. Emails that can wait, above all bulk ones, are queued with
+    `OutgoingEmail.objects.queue` instead.
 
     :param subject: Subject of the email.
     :param message: Body of the email.
@@ -21,8 +99,191 @@ def send_email_task(
     :return: True if the email is sent successfully, False otherwise.
     """
     try:
-        send_mail(subject, message, from_email, recipient_list)
+        send_messages([EmailMessage(subject, message, from_email, recipient_list)])
         return True
     except smtplib.SMTPException as e:
         logger.error(e)
         return False
+
+
+@shared_task(base=CompactResultTask)
+def send_mass_email_task(
+    subject: str, message: str, from_email: str, recipient_list: list[str]
+) -> dict[str, int | list[str]]:
+    """
+    A Celery task to send the same email to each recipient separately over one connection.
+
+    New bulk emails are queued with `OutgoingEmail.objects.queue`, which only inserts them for the outbox
+    drainer.
+
+    :param subject: Subject of the email.
+    :param message: Body of the email.
+    :param from_email: Sender's email address.
+    :param recipient_list: A list of recipient email addresses.
+    :return: The number of emails sent and the recipients whose email failed.
+    """
+    sent, failed = 0, []
+    for recipient in recipient_list:
+        try:
+            delivered = send_messages(
+                [EmailMessage(subject, message, from_email, [recipient])]
+            )
+        except smtplib.SMTPException as e:
+            logger.error("Failed to send email to %s: %s", recipient, e)
+            delivered = 0
+        if delivered:
+            sent += 1
+        else:
+            failed.append(recipient)
+    return {"sent": sent, "failed": failed}
+
+
+@shared_task
+def drain_email_outbox_task() -> dict[str, int]:
+    """
+    A periodic Celery task to send the pending emails of the outbox.
+
+    Pending emails are claimed EMAIL_OUTBOX_BATCH_SIZE at a time with row locks that concurrent drainers
+    skip, sent over the connection of this worker process and marked in bulk. A batch interrupted by a
+    crash is rolled back and stays pending. Emails are retried until EMAIL_OUTBOX_MAX_ATTEMPTS.
+
+    :return: The number of emails sent and failed.
+    """
+    totals = {"sent": 0, "failed": 0}
+    batch_size = settings.EMAIL_OUTBOX_BATCH_SIZE
+    last_pk = 0  # Emails failing in this run are retried by the next one
+    while True:
+        with transaction.atomic():
+            batch = list(
+                OutgoingEmail.objects.filter(
+                    status=EmailStatus.PENDING.value, pk__gt=last_pk
+                )
+                .select_for_update(skip_locked=True)
+                .order_by("pk")[:batch_size]
+            )
+
+            sent, failed = [], []
+            for email in batch:
+                try:
+                    send_messages([email.as_message()])
+                    sent.append(email.pk)
+                except smtplib.SMTPException as e:
+                    logger.error("Failed to send email to %s: %s", email.recipient, e)
+                    email.attempts += 1
+                    email.last_error = str(e)
+                    if email.attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+                        email.status = EmailStatus.FAILED.value
+                    failed.append(email)
+
+            OutgoingEmail.objects.filter(pk__in=sent).update(
+                status=EmailStatus.SENT.value,
+                sent_at=timezone.now(),
+                attempts=F("attempts") + 1,
+            )
+            OutgoingEmail.objects.bulk_update(
+                failed, ["status", "attempts", "last_error"]
+            )
+
+        totals["sent"] += len(sent)
+        totals["failed"] += len(failed)
+        if len(batch) < batch_size:
+            break
+        last_pk = batch[-1].pk
+
+    logger.info(
+        "Drained the email outbox: %s sent, %s failed",
+        totals["sent"],
+        totals["failed"],
+    )
+    return totals
+
+
+# pylint: disable=redefined-builtin
+@shared_task(base=CompactResultTask)
+def bulk_notify_task(
+    title: str,
+    message: str,
+    link: str,
+    type: str = "info",
+    user_ids: list[int] | None = None,
+) -> int:
+    """
+    A Celery task to send the same notification to many users.
+
+    The users are streamed from the database and the notifications inserted in batches of
+    NOTIFICATION_BULK_BATCH_SIZE.
+
+    :param title: The title of the notification.
+    :param message: The message content of the notification.
+    :param link: The URL to which the notification redirects.
+    :param type: The type of the notification.
+    :param user_ids: The ids of the users to notify, all active users if not given.
+    :return: The number of notifications created.
+    """
+    users = User.objects.filter(is_active=True)
+    if user_ids is not None:
+        users = users.filter(pk__in=user_ids)
+
+    created = Notification.objects.bulk_notify(users, title, message, link, type)
+    logger.info("Created %s notifications titled %r", created, title)
+    return created
+
+
+def _delete_in_batches(queryset: QuerySet, batch_size: int) -> int:
+    """
+    Delete the rows of a queryset oldest first in batches, each in its own short transaction.
+
+    The batches go through the ORM, so the delete signals that auditlog and the cache invalidation rely on
+    are still sent for every row.
+
+    :param queryset: The rows to delete.
+    :param batch_size: The maximum number of rows deleted per statement.
+    :return: The number of rows deleted.
+    """
+    deleted = 0
+    while True:
+        batch = list(queryset.order_by("pk").values_list("pk", flat=True)[:batch_size])
+        if not batch:
+            return deleted
+        deleted += queryset.model.objects.filter(pk__in=batch).delete()[0]
+        if len(batch) < batch_size:
+            return deleted
+
+
+@shared_task
+def purge_read_notifications_task() -> int:
+    """
+    A periodic Celery task to delete read notifications older than NOTIFICATION_RETENTION_DAYS.
+
+    Rows are deleted in batches of NOTIFICATION_RETENTION_BATCH_SIZE to avoid long locks.
+
+    :return: The number of notifications deleted.
+    """
+    cutoff = timezone.now() - timedelta(days=settings.NOTIFICATION_RETENTION_DAYS)
+    expired = Notification.objects.filter(is_read=True, created_at__lt=cutoff)
+
+    deleted = _delete_in_batches(expired, settings.NOTIFICATION_RETENTION_BATCH_SIZE)
+    logger.info("Deleted %s read notifications created before %s", deleted, cutoff)
+    return deleted
+
+
+@shared_task
+def purge_task_results_task() -> int:
+    """
+    A periodic Celery task to delete stored task results older than TASK_RESULT_RETENTION_DAYS.
+
+    This replaces Celery's built-in backend cleanup, which deletes every expired row in one statement.
+
+    :return: The number of task and group results deleted.
+    """
+    cutoff = timezone.now() - timedelta(days=settings.TASK_RESULT_RETENTION_DAYS)
+    batch_size = settings.TASK_RESULT_PURGE_BATCH_SIZE
+
+    deleted = _delete_in_batches(
+        TaskResult.objects.filter(date_done__lt=cutoff), batch_size
+    )
+    deleted += _delete_in_batches(
+        GroupResult.objects.filter(date_done__lt=cutoff), batch_size
+    )
+    logger.info("Deleted %s task results finished before %s", deleted, cutoff)
+    return deleted
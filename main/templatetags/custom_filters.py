@@ -37,8 +37,8 @@ def contact_status_choices():
 @register.inclusion_tag("components/social_media_row.html")
 def social_media_row():
     """
-    Grab social media links from the database and return them to the template.
+    Grab social media links from the cache, or the database on a cold cache, and return them to the template.
     :return: A dictionary containing the social media links.
     """
-    links = SocialMediaLink.objects.all()
+    links = SocialMediaLink.objects.cached_all()
     return {"links": links}
@@ -4,6 +4,7 @@ from django.urls import path
 from .views import (
     HomeView,
     MarkAsReadAndRedirectView,
+    MarkAllAsReadView,
     TermsAndConditionsView,
     PrivacyPolicyView,
     ContactUsView,
@@ -24,4 +25,9 @@ urlpatterns = [
         MarkAsReadAndRedirectView.as_view(),
         name="mark_as_read_and_redirect",
     ),
+    path(
+        "mark_all_as_read/",
+        MarkAllAsReadView.as_view(),
+        name="mark_all_as_read",
+    ),
 ]
@@ -1,7 +1,18 @@
+from datetime import datetime
+from typing import Optional
+
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.admin.utils import unquote
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.db import transaction
 from django.shortcuts import render, redirect
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.utils.http import url_has_allowed_host_and_scheme
 from django.views import View
+from django.views.decorators.http import condition
 from django.views.generic import TemplateView, RedirectView
 from django.http import (
     HttpResponseBadRequest,
@@ -10,37 +21,108 @@ from django.http import (
     HttpResponse,
 )
 
+from main.cache import cache_page_for_anonymous, get_page_cache_version
 from main.forms import ContactForm
 from main.models import Notification, TermsAndConditions, PrivacyPolicy
 
 
+@method_decorator(transaction.non_atomic_requests, name="dispatch")
+@method_decorator(cache_page_for_anonymous(60 * 5), name="get")
 class HomeView(TemplateView):
     """View to the home page."""
 
     template_name = "main/home.html"
 
 
-class TermsAndConditionsView(TemplateView):
+class CurrentDocumentMixin:
+    """
+    Mixin for views rendering the current version of an append-only document.
+
+    Anonymous visitors get ETag and Last-Modified headers, so repeat visits are answered with a 304
+    while the page is unchanged. Authenticated users are excluded because their navbar differs.
+    """
+
+    model = None
+
+    def get_document(self):
+        """
+        Return the current version of the document.
+        """
+        return self.model.objects.current()
+
+    def get_etag(self, request, *args, **kwargs) -> Optional[str]:
+        """
+        Return the ETag of the page.
+
+        It changes when the document is edited, when the page cache version moves on for the footer's
+        social media links, when the footer's copyright year turns and with the deployed version.
+        """
+        if request.user.is_authenticated:
+            return None
+        try:
+            document = self.get_document()
+        except self.model.DoesNotExist:
+            return None
+        return "-".join(
+            str(part)
+            for part in (
+                self.model._meta.label_lower,
+                document.pk,
+                document.updated_at.timestamp(),
+                get_page_cache_version(),
+                timezone.localtime().year,
+                settings.VERSION,
+            )
+        )
+
+    def get_last_modified(self, request, *args, **kwargs) -> Optional[datetime]:
+        """
+        Return the time the document was last updated.
+        """
+        if request.user.is_authenticated:
+            return None
+        try:
+            return self.get_document().updated_at
+        except self.model.DoesNotExist:
+            return None
+
+    def dispatch(self, request, *args, **kwargs):
+        """
+        Answer conditional requests before rendering the page.
+        """
+        view = condition(
+            etag_func=self.get_etag, last_modified_func=self.get_last_modified
+        )(super().dispatch)
+        return view(request, *args, **kwargs)
+
+
+@method_decorator(transaction.non_atomic_requests, name="dispatch")
+@method_decorator(cache_page_for_anonymous(60 * 60), name="get")
+class TermsAndConditionsView(CurrentDocumentMixin, TemplateView):
 
     """View to the terms and conditions page."""
 
     template_name = "main/terms_and_conditions.html"
+    model = TermsAndConditions
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context["terms"] = TermsAndConditions.objects.latest("created_at").terms
+        context["terms"] = self.get_document().terms
         return context
 
 
-class PrivacyPolicyView(TemplateView):
+@method_decorator(transaction.non_atomic_requests, name="dispatch")
+@method_decorator(cache_page_for_anonymous(60 * 60), name="get")
+class PrivacyPolicyView(CurrentDocumentMixin, TemplateView):
 
     """View to the privacy policy page."""
 
     template_name = "main/privacy_policy.html"
+    model = PrivacyPolicy
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context["privacy_policy"] = PrivacyPolicy.objects.latest("created_at")
+        context["privacy_policy"] = self.get_document()
         return context
 
 
@@ -89,28 +171,58 @@ class MarkAsReadAndRedirectView(RedirectView):
 
         decoded_url = unquote(destination_url)  # Decode the URL
 
-        # Its important the next line returns a 404 if it doesn't match because otherwise a malicious user could
+        # Its important the next lines return a 404 if it doesn't match because otherwise a malicious user could
         # use the redirect parameter to redirect any user to any site they want. Using our domain to gain credibility.
-        try:
-            notification = Notification.objects.get(
+        # Marking an unread notification of the user is a single UPDATE, only an already read one needs a
+        # second lookup.
+        if not Notification.objects.mark_as_read(
+            notification_id, link=destination_url, user_id=request.user.pk
+        ):
+            if not Notification.objects.filter(
                 id=notification_id, link=destination_url
-            )
-        except Notification.DoesNotExist:
-            return HttpResponse(status=404)
-
-        # Mark the notification as read
-        notification.mark_as_read()
+            ).exists():
+                return HttpResponse(status=404)
 
         return HttpResponseRedirect(decoded_url)  # Redirect to the decoded URL
 
 
+class MarkAllAsReadView(LoginRequiredMixin, View):
+    """
+    A view that marks all unread notifications of the user as read, then redirects back.
+    """
+
+    http_method_names = ["post"]
+
+    def post(self, request, *args, **kwargs) -> HttpResponse:
+        """
+        Handle POST requests.
+
+        :param request: HttpRequest object
+        :return: HttpResponse redirecting to the `next` parameter if it is safe, the home page otherwise
+        """
+        Notification.objects.mark_all_as_read(request.user.pk)
+
+        next_url = request.POST.get("next")
+        if not url_has_allowed_host_and_scheme(
+            next_url,
+            allowed_hosts={request.get_host()},
+            require_https=request.is_secure(),
+        ):
+            next_url = reverse("home")
+        return HttpResponseRedirect(next_url)
+
+
+@method_decorator(transaction.non_atomic_requests, name="dispatch")
 class ContactUsView(View):
     """
     View to handle the Contact Us form.
+
+    The empty form is served from the page cache, a submitted message is saved atomically.
     """
 
     template_name = "main/contact_us.html"
 
+    @method_decorator(cache_page_for_anonymous(60 * 60, vary_on_csrf=True))
     def get(self, request, *args, **kwargs):
         """
         Handle GET requests. Display the contact form.
@@ -118,6 +230,7 @@ class ContactUsView(View):
         form = ContactForm()
         return render(request, self.template_name, {"form": form})
 
+    @method_decorator(transaction.atomic)
     def post(self, request, *args, **kwargs):
         """
         Handle POST requests. Process the form submission.
@@ -1,3 +1,7 @@
+import shutil
+import tempfile
+import unittest
+
 from django.test import TestCase
 
 from tests.factories.users import UserFactory
@@ -18,3 +22,12 @@ class BaseTestCase(TestCase):
 
         # Create a superuser
         self.superuser = UserFactory(is_superuser=True, is_staff=True)
+
+
+def make_temp_dir(test_case: unittest.TestCase) -> str:
+    """
+    Create a temporary directory that is removed with all of its content after the test.
+    """
+    path = tempfile.mkdtemp()
+    test_case.addCleanup(shutil.rmtree, path, ignore_errors=True)
+    return path
@@ -0,0 +1,72 @@
+"""
+Benchmark of Notification.objects.bulk_notify against creating the same notifications one by one.
+
+Run it from the repository root, it creates a throwaway database next to the one of the test settings and
+drops it afterwards:
+
+    python -m tests.benchmarks.bench_bulk_notify --users 5000
+"""
+
+import argparse
+import os
+import time
+
+import django
+
+TITLE = "Benchmark"
+MESSAGE = "A notification sent to every user."
+LINK = "https://example.com/"
+
+
+def report(label: str, rows: int, duration: float) -> None:
+    """
+    Print the throughput of a fan-out.
+    """
+    print(f"{label:<22}{rows} rows in {duration:.2f}s, {rows / duration:,.0f} rows/s")
+
+
+def main() -> None:
+    """
+    Fan a notification out to the given number of users both ways and print the throughput.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", maxsplit=1)[0])
+    parser.add_argument("--users", type=int, default=5000)
+    args = parser.parse_args()
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "tests.settings")
+    django.setup()
+    # Models can only be imported once the apps are set up
+    # pylint: disable=import-outside-toplevel
+    from django.db import connection
+
+    from main.models import Notification
+    from users.models import User
+
+    old_name = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        User.objects.bulk_create(
+            User(username=f"bench-{i}", email=f"bench-{i}@example.com")
+            for i in range(args.users)
+        )
+        users = list(User.objects.all())
+
+        start = time.perf_counter()
+        for user in users:
+            Notification.objects.create(
+                user=user, title=TITLE, message=MESSAGE, link=LINK
+            )
+        report("per-object create():", len(users), time.perf_counter() - start)
+
+        Notification.objects.all().delete()
+        start = time.perf_counter()
+        created = Notification.objects.bulk_notify(
+            User.objects.all(), TITLE, MESSAGE, LINK
+        )
+        report("bulk_notify():", created, time.perf_counter() - start)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from main.cache import get_page_cache_version, invalidate_page_cache, tiered_cache
+from main.models import PrivacyPolicy
+from main.models.business import SOCIAL_MEDIA_LINKS_CACHE_KEY
+from tests.factories.main import SocialMediaLinkFactory
+from tests.factories.users import UserFactory
+
+
+@override_settings(PAGE_CACHE_ENABLED=True)
+class PageCacheTest(TestCase):
+    """
+    Test cases for the page cache of anonymous visitors.
+    """
+
+    def setUp(self) -> None:
+        super().setUp()
+        cache.clear()
+        PrivacyPolicy.objects.create(policy="This is a test privacy policy page.")
+        self.url = reverse("privacy_policy")
+
+    def test_anonymous_page_cached(self):
+        """
+        Test that a repeat visit is served from the cache without any query.
+        """
+        response = self.client.get(self.url)
+        with CaptureQueriesContext(connection) as queries:
+            cached_response = self.client.get(self.url)
+        self.assertFalse([q for q in queries if "SAVEPOINT" not in q["sql"]])
+        self.assertEqual(cached_response.status_code, 200)
+        self.assertEqual(cached_response.content, response.content)
+        self.assertIn("Cookie", cached_response["Vary"])
+
+    def test_authenticated_user_not_cached(self):
+        """
+        Test that visitors with a session always get a freshly rendered page.
+        """
+        self.client.get(self.url)
+        self.client.force_login(UserFactory())
+        response = self.client.get(self.url)
+        self.assertIsNotNone(response.context)
+
+    def test_pending_messages_not_cached(self):
+        """
+        Test that visitors with pending messages get a freshly rendered page.
+        """
+        self.client.get(self.url)
+        self.client.cookies["messages"] = "pending"
+        response = self.client.get(self.url)
+        self.assertIsNotNone(response.context)
+
+    def test_disabled(self):
+        """
+        Test that nothing is cached when the page cache is disabled.
+        """
+        with self.settings(PAGE_CACHE_ENABLED=False):
+            self.client.get(self.url)
+            response = self.client.get(self.url)
+        self.assertIsNotNone(response.context)
+
+    def test_content_change_invalidates(self):
+        """
+        Test that saving the content of a page expires the cached pages.
+        """
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            PrivacyPolicy.objects.create(policy="This is the new privacy policy.")
+        self.assertContains(
+            self.client.get(self.url), "This is the new privacy policy."
+        )
+
+        home_url = reverse("home")
+        self.client.get(home_url)
+        with self.captureOnCommitCallbacks(execute=True):
+            link = SocialMediaLinkFactory()
+        self.assertContains(self.client.get(home_url), link.profile_url)
+
+    def test_invalidate_page_cache(self):
+        """
+        Test that invalidating moves to the next version of the page cache.
+        """
+        invalidate_page_cache()  # Nothing cached yet
+        version = get_page_cache_version()
+        invalidate_page_cache()
+        self.assertEqual(get_page_cache_version(), version + 1)
+
+
+@override_settings(PAGE_CACHE_ENABLED=True)
+class CsrfPageCacheTest(TestCase):
+    """
+    Test cases for the page cache of pages embedding a CSRF token.
+    """
+
+    def setUp(self) -> None:
+        super().setUp()
+        cache.clear()
+        self.url = reverse("contact_us")
+
+    def test_not_cached_without_csrf_cookie(self):
+        """
+        Test that the page is not cached for a visitor who has yet to receive a CSRF cookie.
+        """
+        client = self.client_class()
+        client.get(self.url)
+        client.cookies.pop(settings.CSRF_COOKIE_NAME)
+        response = client.get(self.url)
+        self.assertIsNotNone(response.context)
+
+    def test_cached_per_csrf_cookie(self):
+        """
+        Test that the page is cached per CSRF cookie, so no visitor gets the token of another.
+        """
+        self.client.get(self.url)  # Receives the CSRF cookie
+        self.client.get(self.url)
+        response = self.client.get(self.url)
+        self.assertIsNone(response.context)
+
+        other_client = self.client_class()
+        other_client.get(self.url)
+        other_client.get(self.url)
+        other_response = other_client.get(self.url)
+        self.assertIsNone(other_response.context)
+        self.assertNotEqual(response.content, other_response.content)
+
+
+TIERED_CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "tiered-shared",
+    },
+    "local": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "tiered-local",
+    },
+}
+
+
+@override_settings(PAGE_CACHE_ENABLED=True, CACHES=TIERED_CACHES)
+class TieredPageCacheTest(TestCase):
+    """
+    Test cases for the page cache on top of the local copies other processes keep after an invalidation.
+    """
+
+    def setUp(self) -> None:
+        super().setUp()
+        caches["default"].clear()
+        caches["local"].clear()
+        self.stale_policy = PrivacyPolicy.objects.create(policy="The old policy.")
+        self.url = reverse("privacy_policy")
+
+    def test_stale_local_document_not_cached(self):
+        """
+        Test that a page rendered while the local tier still holds the old document is not cached stale.
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            PrivacyPolicy.objects.create(policy="The new policy.")
+        # The local copy of another process, which the invalidation above could not reach
+        caches["local"].set(PrivacyPolicy.objects.cache_key, self.stale_policy)
+        self.assertContains(self.client.get(self.url), "The new policy.")
+        response = self.client.get(self.url)
+        self.assertIsNone(response.context)
+        self.assertContains(response, "The new policy.")
+
+    def test_stale_local_links_not_cached(self):
+        """
+        Test that a page rendered while the local tier still holds the old footer links is not cached stale.
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            link = SocialMediaLinkFactory()
+        caches["local"].set(SOCIAL_MEDIA_LINKS_CACHE_KEY, [])
+        self.client.get(self.url)
+        response = self.client.get(self.url)
+        self.assertIsNone(response.context)
+        self.assertContains(response, link.profile_url)
+
+    def test_local_tier_used_outside_page_cache(self):
+        """
+        Test that reads outside a cached page still use the local tier.
+        """
+        caches["local"].set(PrivacyPolicy.objects.cache_key, self.stale_policy)
+        caches["default"].delete(PrivacyPolicy.objects.cache_key)
+        self.assertEqual(PrivacyPolicy.objects.current(), self.stale_policy)
+
+
+@override_settings(CACHES=TIERED_CACHES)
+class TieredCacheTest(TestCase):
+    """
+    Test cases for the two-tier cache.
+    """
+
+    def setUp(self) -> None:
+        super().setUp()
+        caches["default"].clear()
+        caches["local"].clear()
+
+    def test_get_or_set_fills_both_tiers(self):
+        """
+        Test that a miss computes the value once and stores it in both tiers.
+        """
+        self.assertEqual(tiered_cache.get_or_set("key", lambda: "value"), "value")
+        self.assertEqual(caches["default"].get("key"), "value")
+        self.assertEqual(caches["local"].get("key"), "value")
+        self.assertEqual(tiered_cache.get_or_set("key", lambda: "other"), "value")
+
+    def test_local_tier_served_first(self):
+        """
+        Test that the local tier answers without reaching the shared cache.
+        """
+        caches["local"].set("key", "local value")
+        caches["default"].set("key", "shared value")
+        self.assertEqual(tiered_cache.get_or_set("key", "default"), "local value")
+
+    def test_local_miss_refilled_from_shared(self):
+        """
+        Test that a value set by another process is copied into the local tier.
+        """
+        caches["default"].set("key", "shared value")
+        self.assertEqual(tiered_cache.get_or_set("key", "default"), "shared value")
+        self.assertEqual(caches["local"].get("key"), "shared value")
+
+    def test_delete_clears_both_tiers(self):
+        """
+        Test that deleting a key removes it from both tiers.
+        """
+        tiered_cache.get_or_set("key", "value")
+        tiered_cache.delete("key")
+        self.assertIsNone(caches["default"].get("key"))
+        self.assertIsNone(caches["local"].get("key"))
@@ -1,10 +1,18 @@
+import os
 import subprocess
+import tempfile
 from io import StringIO
 from unittest import mock
 
-from django.test import TestCase, override_settings
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
 from django.core.management import call_command
 from main.management.commands.restore_db import Command, NO_COMMANDS_MESSAGE
+from main.models import Contact, Notification
+from tests.base import make_temp_dir
+from tests.factories.main import ContactFactory, NotificationFactory
+from tests.factories.users import UserFactory
+from users.models import User
 
 
 @override_settings(DEBUG=True)
@@ -231,3 +239,757 @@ class RestoreDbCommandTest(TestCase):
         commands = self.command.generate_source_commands("test", "file.dump")
         self.assertEqual(len(commands), 1)
         self.assertIn("pg_dump -Fc -v --host=", commands[0])
+
+    @mock.patch(
+        "main.management.commands.restore_db.os.path.exists", return_value=False
+    )
+    def test_generate_source_commands_with_jobs(self, mock_exists):
+        """Test that a parallel dump is written in directory format."""
+        commands = self.command.generate_source_commands("test", "file.dump", jobs=4)
+        self.assertEqual(len(commands), 1)
+        self.assertIn("pg_dump -Fd -j 4 -v --host=", commands[0])
+        self.assertTrue(commands[0].endswith("-f file.dump"))
+
+    @mock.patch("main.management.commands.restore_db.os.path.exists", return_value=True)
+    @mock.patch("main.management.commands.restore_db.input", return_value="y")
+    def test_generate_source_commands_with_jobs_overrides_dump(
+        self, mock_input, mock_exists
+    ):
+        """Test that overriding a dump does not shell out to remove it."""
+        commands = self.command.generate_source_commands("test", "file.dump", jobs=4)
+        self.assertEqual(len(commands), 1)
+        self.assertIn("pg_dump -Fd -j 4", commands[0])
+
+    @mock.patch(
+        "main.management.commands.restore_db.os.path.exists", return_value=False
+    )
+    def test_generate_commands_quote_file_name(self, mock_exists):
+        """Test that the dump file name is quoted in the shell commands."""
+        file_name = "my dump; rm -rf ~"
+        commands = self.command.generate_source_commands("test", file_name)
+        self.assertTrue(commands[0].endswith("-f 'my dump; rm -rf ~'"))
+        kwargs = {"drop": False, "restore": True, "jobs": None}
+        commands = self.command.generate_target_commands("local", kwargs, file_name)
+        self.assertTrue(commands[-1].endswith(" 'my dump; rm -rf ~'"))
+
+    @mock.patch("main.management.commands.restore_db.Command.run_phase")
+    def test_run_dump_removes_dump_directory(self, mock_run_phase):
+        """Test that an existing dump directory is removed before dumping into it."""
+        file_name = os.path.join(make_temp_dir(self), "file.dump")
+        os.makedirs(os.path.join(file_name, "toc"))
+        self.command.run_dump(
+            "test", ["pg_dump"], file_name, {"max_age": None, "jobs": 4}
+        )
+        self.assertFalse(os.path.exists(file_name))
+        mock_run_phase.assert_called_once()
+
+    @mock.patch("main.management.commands.restore_db.subprocess.check_call")
+    def test_directory_dump_replaces_file_dump(self, mock_check_call):
+        """Test that a custom format dump file is removed before a parallel directory format dump."""
+        with tempfile.TemporaryDirectory() as directory:
+            file_name = os.path.join(directory, "restore.dump")
+            with open(file_name, "wb") as file:
+                file.write(b"custom format dump")
+            mock_check_call.side_effect = lambda command, **kwargs: self.assertFalse(
+                command.startswith("pg_dump") and os.path.exists(file_name)
+            )
+            call_command(
+                "restore_db",
+                "--jobs=4",
+                "--no-input",
+                source="test",
+                target="local",
+                file_name=file_name,
+                stdout=StringIO(),
+            )
+        commands = [call.args[0] for call in mock_check_call.call_args_list]
+        self.assertIn("pg_dump -Fd -j 4", commands[0])
+
+    def test_generate_target_commands_with_jobs(self):
+        """Test that pg_restore runs with the given number of jobs."""
+        kwargs = {"drop": False, "restore": True, "jobs": 4}
+        commands = self.command.generate_target_commands("local", kwargs, "file.dump")
+        self.assertIn("pg_restore -v -j 4 --no-owner", commands[-1])
+
+        kwargs["jobs"] = None
+        commands = self.command.generate_target_commands("local", kwargs, "file.dump")
+        self.assertIn("pg_restore -v  --no-owner", commands[-1])
+
+    @mock.patch("main.management.commands.restore_db.sys.exit")
+    def test_validate_arguments_invalid_jobs(self, mock_exit):
+        """Test that validate_arguments exits when the number of jobs is below 1."""
+        self.command.validate_arguments(
+            source="test", target="local", file_name="file.dump", jobs=0
+        )
+        mock_exit.assert_called_once_with(1)
+
+    @mock.patch("main.management.commands.restore_db.subprocess.check_call")
+    @mock.patch("main.management.commands.restore_db.os.path.exists", return_value=True)
+    @mock.patch("sys.stdout", new_callable=StringIO)
+    def test_jobs_default_to_cpu_count_and_phases_timed(
+        self, mock_stdout, mock_exists, mock_check_call
+    ):
+        """Test that --jobs without a value uses the CPU count and each phase reports its duration."""
+        with mock.patch(
+            "main.management.commands.restore_db.input", return_value="y"
+        ), mock.patch(
+            "main.management.commands.restore_db.os.cpu_count", return_value=8
+        ):
+            call_command("restore_db", "--jobs", source="test", target="local")
+        commands = [call.args[0] for call in mock_check_call.call_args_list]
+        self.assertIn("pg_dump -Fd -j 8", commands[0])
+        self.assertIn("pg_restore -v -j 8", commands[-2])
+        self.assertIn("vacuumdb --analyze-only --jobs=8", commands[-1])
+        self.assertIn("Dump finished in", mock_stdout.getvalue())
+        self.assertIn("Restore finished in", mock_stdout.getvalue())
+        self.assertIn("Analyze finished in", mock_stdout.getvalue())
+
+
+@override_settings(DEBUG=True)
+class RestoreDbStreamTest(TestCase):
+    """
+    Test suite for the --stream mode of the restore_db command.
+    """
+
+    def setUp(self):
+        """
+        Set up the test suite.
+        :return: None
+        """
+        self.command = Command(stdout=StringIO())
+
+    @mock.patch("main.management.commands.restore_db.sys.exit")
+    def test_validate_arguments_stream_needs_remote_source(self, mock_exit):
+        """Test that streaming needs a source to dump from."""
+        self.command.validate_arguments(
+            source="local", target="test", file_name="file.dump", stream=True
+        )
+        mock_exit.assert_called_once_with(1)
+
+    @mock.patch("main.management.commands.restore_db.subprocess.check_call")
+    @mock.patch(
+        "main.management.commands.restore_db.stream_dump", return_value=(True, 0)
+    )
+    def test_handle_stream(self, mock_stream_dump, mock_check_call):
+        """Test that streaming replaces the dump file and the restore from it."""
+        call_command(
+            "restore_db", "--stream", "--no-input", source="test", target="local"
+        )
+        commands = [call.args[0] for call in mock_check_call.call_args_list]
+        self.assertEqual(len(commands), 3)
+        self.assertTrue(all(command.startswith("psql") for command in commands[:2]))
+        self.assertTrue(commands[2].startswith("vacuumdb --analyze-only"))
+        dump_args, restore_args = mock_stream_dump.call_args.args[:2]
+        self.assertEqual(dump_args[:2], ["pg_dump", "-Fc"])
+        self.assertEqual(restore_args[:2], ["pg_restore", "--no-owner"])
+
+    @mock.patch("main.management.commands.restore_db.subprocess.check_call")
+    @mock.patch("main.management.commands.restore_db.stream_dump")
+    def test_handle_stream_progress(self, mock_stream_dump, mock_check_call):
+        """Test that the progress of the stream is written in MiB."""
+
+        def stream_dump(*args):
+            on_progress = args[-1]
+            on_progress(64 * 2**20)
+            on_progress(100 * 2**20)
+            return True, 0
+
+        mock_stream_dump.side_effect = stream_dump
+        out = StringIO()
+        call_command(
+            "restore_db",
+            "--stream",
+            "--no-input",
+            source="test",
+            target="local",
+            stdout=out,
+        )
+        self.assertIn("Streamed 64 MiB.\nStreamed 100 MiB.\n", out.getvalue())
+        self.assertIn("Stream finished in", out.getvalue())
+
+    @mock.patch("main.management.commands.restore_db.subprocess.check_call")
+    @mock.patch(
+        "main.management.commands.restore_db.stream_dump", return_value=(False, 1)
+    )
+    @mock.patch("main.management.commands.restore_db.input", side_effect=EOFError)
+    def test_handle_stream_fallback(
+        self, mock_input, mock_stream_dump, mock_check_call
+    ):
+        """Test that a failed stream falls back to a restore from a dump file, overriding it without asking."""
+        out = StringIO()
+        with tempfile.TemporaryDirectory() as directory:
+            file_name = os.path.join(directory, "restore.dump")
+            with open(file_name, "wb") as file:
+                file.write(b"old dump")
+            call_command(
+                "restore_db",
+                "--stream",
+                "--no-input",
+                source="test",
+                target="local",
+                file_name=file_name,
+                stdout=out,
+            )
+        mock_input.assert_not_called()
+        self.assertIn("Command failed with error:", out.getvalue())
+        self.assertIn("Streaming the dump failed", out.getvalue())
+        commands = [call.args[0] for call in mock_check_call.call_args_list]
+        self.assertIn("pg_dump -Fc -v --host=", commands[2])
+        self.assertTrue(commands[-2].startswith("pg_restore"))
+        self.assertTrue(commands[-2].endswith("restore.dump"))
+        self.assertTrue(commands[-1].startswith("vacuumdb"))
+
+
+@override_settings(DEBUG=True)
+class RestoreDbTableSelectionTest(TestCase):
+    """
+    Test suite for the table selection options of the restore_db command.
+    """
+
+    def setUp(self):
+        """
+        Set up the test suite.
+        :return: None
+        """
+        self.command = Command(stdout=StringIO())
+        self.kwargs = {"exclude_table_data": [], "include_table": [], "profile": None}
+
+    def test_get_table_args(self):
+        """Test that excluded table data and included tables become pg_dump arguments."""
+        self.kwargs["exclude_table_data"] = ["main_contact"]
+        self.kwargs["include_table"] = ["users_*"]
+        self.assertEqual(
+            self.command.get_table_args(self.kwargs),
+            ["--exclude-table-data=main_contact", "--table=users_*"],
+        )
+
+    def test_get_table_args_slim_profile(self):
+        """Test that the slim profile skips the data of the bulk tables."""
+        self.kwargs["profile"] = "slim"
+        table_args = self.command.get_table_args(self.kwargs)
+        self.assertIn("--exclude-table-data=auditlog_logentry", table_args)
+        self.assertIn("--exclude-table-data=main_notification", table_args)
+        self.assertIn(
+            "--exclude-table-data=django_celery_results_taskresult", table_args
+        )
+
+    @mock.patch(
+        "main.management.commands.restore_db.os.path.exists", return_value=False
+    )
+    def test_generate_source_commands_with_table_args(self, mock_exists):
+        """Test that the table arguments are quoted and passed on to pg_dump."""
+        commands = self.command.generate_source_commands(
+            "test", "file.dump", table_args=["--table=users_*"]
+        )
+        self.assertIn("pg_dump -Fc '--table=users_*' -v --host=", commands[0])
+
+    def test_generate_target_commands_with_included_tables(self):
+        """Test that only the restored tables are dropped, by pg_restore, when tables are selected."""
+        kwargs = {"drop": True, "restore": True, "include_table": ["users_*"]}
+        commands = self.command.generate_target_commands("local", kwargs, "file.dump")
+        self.assertFalse(any("drop_tables.sql" in command for command in commands))
+        self.assertIn("pg_restore -v --clean --if-exists --no-owner", commands[-1])
+
+        kwargs["drop"] = False
+        commands = self.command.generate_target_commands("local", kwargs, "file.dump")
+        self.assertNotIn("--clean", commands[-1])
+
+    @mock.patch("main.management.commands.restore_db.subprocess.check_call")
+    @mock.patch(
+        "main.management.commands.restore_db.stream_dump", return_value=(True, 0)
+    )
+    def test_stream_with_included_tables(self, mock_stream_dump, mock_check_call):
+        """Test that a stream of selected tables is restored with --clean instead of dropping all tables."""
+        call_command(
+            "restore_db",
+            "--stream",
+            "--no-input",
+            "--include-table=users_*",
+            source="test",
+            target="local",
+        )
+        commands = [call.args[0] for call in mock_check_call.call_args_list]
+        self.assertFalse(any("drop_tables.sql" in command for command in commands))
+        restore_args = mock_stream_dump.call_args.args[1]
+        self.assertEqual(
+            restore_args[:4], ["pg_restore", "--no-owner", "--clean", "--if-exists"]
+        )
+
+    @mock.patch("main.management.commands.restore_db.sys.exit")
+    def test_validate_arguments_table_args_need_source(self, mock_exit):
+        """Test that selecting tables needs a source to dump from."""
+        with mock.patch(
+            "main.management.commands.restore_db.os.path.exists", return_value=True
+        ):
+            self.command.validate_arguments(
+                source=None,
+                target="local",
+                file_name="file.dump",
+                table_args=["--table=users_user"],
+            )
+        mock_exit.assert_called_once_with(1)
+
+    @mock.patch("main.management.commands.restore_db.subprocess.check_call")
+    @mock.patch(
+        "main.management.commands.restore_db.os.path.exists", return_value=False
+    )
+    def test_handle_slim_profile(self, mock_exists, mock_check_call):
+        """Test that the slim profile reaches the pg_dump command."""
+        call_command(
+            "restore_db", "--no-input", profile="slim", source="test", target="local"
+        )
+        dump_command = mock_check_call.call_args_list[0].args[0]
+        self.assertIn("--exclude-table-data=main_notification", dump_command)
+
+
+@override_settings(DEBUG=True)
+class RestoreDbDumpCacheTest(TestCase):
+    """
+    Test suite for the dump cache options of the restore_db command.
+    """
+
+    def setUp(self):
+        """
+        Set up the test suite.
+        :return: None
+        """
+        self.cache_dir = make_temp_dir(self)
+
+    @staticmethod
+    def fake_check_call(command, **kwargs):
+        """Stand-in for running the commands, a dump writes its file."""
+        if command.startswith("pg_dump"):
+            with open(command.rsplit("-f ", 1)[1], "wb") as file:
+                file.write(b"dump")
+
+    def restore(self):
+        """Run restore_db from the test database with the dump cache and return the commands run."""
+        with mock.patch(
+            "main.management.commands.restore_db.subprocess.check_call",
+            side_effect=self.fake_check_call,
+        ) as mock_check_call:
+            call_command(
+                "restore_db",
+                "--no-input",
+                source="test",
+                target="local",
+                max_age=60,
+                keep=1,
+                cache_dir=self.cache_dir,
+                stdout=StringIO(),
+            )
+        return [call.args[0] for call in mock_check_call.call_args_list]
+
+    def test_recent_dump_reused(self):
+        """Test that a second restore reuses the cached dump instead of dumping again."""
+        commands = self.restore()
+        self.assertTrue(commands[0].startswith("pg_dump"))
+        dump_path = commands[0].rsplit("-f ", 1)[1]
+        self.assertTrue(dump_path.startswith(self.cache_dir))
+        self.assertTrue(os.path.exists(f"{dump_path}.sha256"))
+
+        commands = self.restore()
+        self.assertFalse(any(command.startswith("pg_dump") for command in commands))
+        self.assertTrue(commands[-2].endswith(dump_path))
+
+    @mock.patch("main.management.commands.restore_db.sys.exit")
+    def test_validate_arguments_max_age_needs_source(self, mock_exit):
+        """Test that the dump cache needs a source to dump from."""
+        Command(stdout=StringIO()).validate_arguments(
+            source="local", target="test", file_name="file.dump", max_age=60
+        )
+        mock_exit.assert_called_once_with(1)
+
+
+@override_settings(DEBUG=True)
+class RestoreDbMultipleTargetsTest(TestCase):
+    """
+    Test suite for restoring a single dump into several targets.
+    """
+
+    def setUp(self):
+        """
+        Set up the test suite.
+        :return: None
+        """
+        self.file_name = os.path.join(make_temp_dir(self), "restore.dump")
+
+    def restore(self, check_call):
+        """Run restore_db from the test database into local and develop, return the commands and output."""
+        out = StringIO()
+        with mock.patch(
+            "main.management.commands.restore_db.subprocess.check_call",
+            side_effect=check_call,
+        ) as mock_check_call:
+            call_command(
+                "restore_db",
+                "--no-input",
+                "--target",
+                "local",
+                "develop",
+                source="test",
+                file_name=self.file_name,
+                stdout=out,
+            )
+        commands = [call.args[0] for call in mock_check_call.call_args_list]
+        return commands, out.getvalue()
+
+    def test_single_dump_restored_into_each_target(self):
+        """Test that the source is dumped once and every target logs into its own file."""
+
+        def check_call(command, **kwargs):
+            if "stdout" in kwargs:
+                kwargs["stdout"].write(command.split()[0])
+
+        commands, output = self.restore(check_call)
+        dumps = [command for command in commands if command.startswith("pg_dump")]
+        restores = [command for command in commands if command.startswith("pg_restore")]
+        self.assertEqual(len(dumps), 1)
+        self.assertEqual(len(restores), 2)
+        self.assertIn("Restored 2 of 2 targets", output)
+        for target in ("local", "develop"):
+            with open(f"{self.file_name}.{target}.log", encoding="utf-8") as log:
+                self.assertIn("pg_restore", log.read())
+
+    def test_failed_target_in_summary(self):
+        """Test that a failing target is reported without stopping the other targets."""
+
+        def check_call(command, **kwargs):
+            if command.startswith("pg_restore") and "--host=develop-host" in command:
+                raise subprocess.CalledProcessError(1, command)
+
+        with mock.patch.dict(Command.DATABASE_CONFIG["develop"], host="develop-host"):
+            _, output = self.restore(check_call)
+        self.assertIn("Restore of develop failed", output)
+        self.assertIn("Restore of local finished", output)
+        self.assertIn("Restored 1 of 2 targets", output)
+
+    @mock.patch("main.management.commands.restore_db.subprocess.check_call")
+    def test_duplicated_targets_restored_once(self, mock_check_call):
+        """Test that a target given twice is restored once."""
+        call_command(
+            "restore_db",
+            "--no-input",
+            "--target",
+            "local",
+            "local",
+            source="test",
+            file_name=self.file_name,
+            stdout=StringIO(),
+        )
+        commands = [call.args[0] for call in mock_check_call.call_args_list]
+        self.assertEqual(
+            len([command for command in commands if command.startswith("pg_restore")]),
+            1,
+        )
+
+    @mock.patch("main.management.commands.restore_db.sys.exit")
+    def test_validate_arguments_production_among_targets(self, mock_exit):
+        """Test that production cannot be one of several targets."""
+        Command(stdout=StringIO()).validate_arguments(
+            source="test", target=["local", "production"], file_name="file.dump"
+        )
+        mock_exit.assert_called_with(1)
+
+    @mock.patch("main.management.commands.restore_db.sys.exit")
+    def test_validate_arguments_stream_single_target(self, mock_exit):
+        """Test that streaming needs a single target."""
+        Command(stdout=StringIO()).validate_arguments(
+            source="test",
+            target=["local", "develop"],
+            file_name="file.dump",
+            stream=True,
+        )
+        mock_exit.assert_called_with(1)
+
+
+@override_settings(DEBUG=True)
+class RestoreDbMaintenanceTest(TestCase):
+    """
+    Test suite for the session tuning and the maintenance after a restore.
+    """
+
+    def setUp(self):
+        """
+        Set up the test suite.
+        :return: None
+        """
+        self.command = Command(stdout=StringIO())
+        self.kwargs = {
+            "drop": True,
+            "restore": True,
+            "anonymize": False,
+            "analyze": True,
+            "vacuum": False,
+            "jobs": 4,
+            "maintenance_work_mem": "2GB",
+        }
+
+    def test_generate_target_phases(self):
+        """Test that the tables are analyzed, or vacuumed with --vacuum, after the restore."""
+        phases = self.command.generate_target_phases("local", self.kwargs, "file.dump")
+        self.assertEqual(list(phases), ["Restore", "Analyze"])
+        self.assertIn("vacuumdb --analyze-only --jobs=4 --host=", phases["Analyze"][0])
+
+        self.kwargs.update(analyze=False, vacuum=True)
+        phases = self.command.generate_target_phases("local", self.kwargs, "file.dump")
+        self.assertIn("vacuumdb --analyze --jobs=4 --host=", phases["Vacuum"][0])
+
+    def test_no_maintenance(self):
+        """Test that nothing is maintained with --no-analyze or without a restore."""
+        self.kwargs["analyze"] = False
+        phases = self.command.generate_target_phases("local", self.kwargs, "file.dump")
+        self.assertEqual(list(phases), ["Restore"])
+        self.kwargs.update(analyze=True, restore=False)
+        phases = self.command.generate_target_phases("local", self.kwargs, "file.dump")
+        self.assertEqual(phases, {"Restore": []})
+
+    @mock.patch("main.management.commands.restore_db.subprocess.check_call")
+    @mock.patch(
+        "main.management.commands.restore_db.os.path.exists", return_value=False
+    )
+    def test_handle_restores_with_tuned_env(self, mock_exists, mock_check_call):
+        """Test that the restore and analyze run tuned while the dump does not."""
+        call_command(
+            "restore_db",
+            "--no-input",
+            "--maintenance-work-mem=512MB",
+            source="test",
+            target="local",
+            stdout=StringIO(),
+        )
+        options = {
+            call.args[0].split()[0]: call.kwargs["env"].get("PGOPTIONS", "")
+            for call in mock_check_call.call_args_list
+        }
+        self.assertNotIn("maintenance_work_mem", options["pg_dump"])
+        for program in ("pg_restore", "vacuumdb"):
+            self.assertIn("maintenance_work_mem=512MB", options[program])
+
+
+@override_settings(DEBUG=True)
+class AnonymizeDbCommandTest(TransactionTestCase):
+    """
+    Test suite for the anonymize_db command, run against the test database.
+    """
+
+    def setUp(self):
+        """
+        Set up the test suite.
+        :return: None
+        """
+        super().setUp()
+        settings_dict = connection.settings_dict
+        patcher = mock.patch.dict(
+            Command.DATABASE_CONFIG["local"],
+            host=settings_dict["HOST"],
+            dbname=settings_dict["NAME"],
+            username=settings_dict["USER"],
+            password=settings_dict["PASSWORD"],
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        NotificationFactory.create_batch(3)
+        ContactFactory.create_batch(2)
+
+    def test_personal_data_anonymized(self):
+        """Test that every row is anonymized in chunks and the rows are reported per table."""
+        out = StringIO()
+        call_command("anonymize_db", chunk_size=2, jobs=2, stdout=out)
+
+        for user in User.objects.all():
+            self.assertEqual(user.username, f"user:{user.pk}")
+            self.assertEqual(user.email, f"user-{user.pk}@anonymized.invalid")
+            self.assertEqual(user.first_name, "")
+        for contact in Contact.objects.all():
+            self.assertEqual(contact.email, f"contact-{contact.pk}@anonymized.invalid")
+            self.assertEqual(contact.message, "Anonymized message.")
+        self.assertFalse(
+            Notification.objects.exclude(message="Anonymized notification.").exists()
+        )
+        self.assertIn("Anonymized 3 rows of users_user in", out.getvalue())
+        self.assertIn("Anonymized 2 rows of main_contact in", out.getvalue())
+        self.assertIn("Anonymized 8 rows in 4 tables in", out.getvalue())
+
+    def test_username_of_anonymized_user_taken(self):
+        """Test that a real username looking like an anonymized one does not collide with it."""
+        users = UserFactory.create_batch(2)
+        User.objects.filter(pk=users[1].pk).update(username=f"user-{users[0].pk}")
+        call_command("anonymize_db", chunk_size=1, jobs=1, stdout=StringIO())
+        self.assertEqual(
+            User.objects.get(pk=users[1].pk).username, f"user:{users[1].pk}"
+        )
+
+    @override_settings(DEBUG=False)
+    def test_live_server_refused(self):
+        """Test that the command refuses to run on a live server."""
+        out = StringIO()
+        with self.assertRaises(SystemExit):
+            call_command("anonymize_db", stdout=out)
+        self.assertIn(
+            "Running the `anonymize_db` command on a live server.", out.getvalue()
+        )
+        self.assertFalse(User.objects.filter(email__endswith=".invalid").exists())
+
+    @mock.patch("main.management.commands.anonymize_db.sys.exit")
+    def test_production_refused(self, mock_exit):
+        """Test that production cannot be anonymized."""
+        mock_exit.side_effect = SystemExit
+        with self.assertRaises(SystemExit):
+            call_command("anonymize_db", target="production", stdout=StringIO())
+        mock_exit.assert_called_once_with(1)
+        self.assertTrue(User.objects.exclude(email__endswith=".invalid").exists())
+
+    @override_settings(RESTORE_ANONYMIZE_RULES={"users_user": {"missing": "NULL"}})
+    def test_failed_rule(self):
+        """Test that a failing rule is reported and exits with an error."""
+        out = StringIO()
+        with self.assertRaises(SystemExit):
+            call_command("anonymize_db", stdout=out)
+        self.assertIn("Anonymizing failed with error:", out.getvalue())
+
+    @mock.patch("main.management.commands.restore_db.subprocess.check_call")
+    def test_restore_db_anonymize_phase(self, mock_check_call):
+        """Test that restore_db anonymizes the target between the restore and the analyze."""
+        with mock.patch(
+            "main.management.commands.restore_db.os.path.exists", return_value=True
+        ):
+            call_command(
+                "restore_db",
+                "--no-input",
+                "--anonymize",
+                target="test",
+                stdout=StringIO(),
+            )
+        commands = [call.args[0] for call in mock_check_call.call_args_list]
+        self.assertTrue(commands[-3].startswith("pg_restore"))
+        self.assertTrue(commands[-2].endswith("anonymize_db --target=test"))
+        self.assertTrue(commands[-1].startswith("vacuumdb"))
+
+
+@override_settings(DEBUG=True)
+class RestoreDbCompressionTest(TestCase):
+    """
+    Test suite for the compression of the dump and the dry run size estimate.
+    """
+
+    def setUp(self):
+        """
+        Set up the test suite.
+        :return: None
+        """
+        self.command = Command(stdout=StringIO())
+
+    @mock.patch(
+        "main.management.commands.restore_db.os.path.exists", return_value=False
+    )
+    def test_generate_source_commands_with_compress(self, mock_exists):
+        """Test that a parallel directory format dump is compressed per table with the given method."""
+        commands = self.command.generate_source_commands(
+            "test", "file.dump", jobs=4, compress="zstd:3"
+        )
+        self.assertIn("pg_dump -Fd -j 4 --compress=zstd:3 -v", commands[0])
+
+    @mock.patch("main.management.commands.restore_db.sys.exit")
+    def test_validate_arguments_invalid_compress(self, mock_exit):
+        """Test that an unknown compression is rejected."""
+        mock_exit.side_effect = SystemExit
+        with self.assertRaises(SystemExit):
+            self.command.validate_arguments(
+                source="test", target="local", file_name="file.dump", compress="brotli"
+            )
+        mock_exit.assert_called_once_with(1)
+
+    @mock.patch("main.management.commands.restore_db.sys.exit")
+    def test_validate_arguments_invalid_compress_level(self, mock_exit):
+        """Test that a level out of the range of the compression method is rejected."""
+        mock_exit.side_effect = SystemExit
+        with self.assertRaises(SystemExit):
+            self.command.validate_arguments(
+                source="test", target="local", file_name="file.dump", compress="gzip:15"
+            )
+        mock_exit.assert_called_once_with(1)
+        self.assertIn(
+            "gzip:15 is not a valid compression", self.command.stdout.getvalue()
+        )
+
+    @mock.patch("main.management.commands.restore_db.sys.exit")
+    def test_validate_arguments_dry_run_needs_source(self, mock_exit):
+        """Test that the dry run needs a source to measure."""
+        mock_exit.side_effect = SystemExit
+        with self.assertRaises(SystemExit):
+            self.command.validate_arguments(
+                source=None, target="local", file_name="file.dump", dry_run=True
+            )
+        mock_exit.assert_called_once_with(1)
+        self.assertIn("--dry-run needs a source", self.command.stdout.getvalue())
+
+    @mock.patch("main.management.commands.restore_db.sys.exit")
+    def test_validate_arguments_compress_needs_client_support(self, mock_exit):
+        """Test that lz4 and zstd need a pg_dump that supports them."""
+        with mock.patch(
+            "main.management.commands.restore_db.get_pg_dump_version", return_value=15
+        ):
+            self.command.validate_arguments(
+                source="test", target="local", file_name="file.dump", compress="lz4"
+            )
+        mock_exit.assert_called_once_with(1)
+
+        mock_exit.reset_mock()
+        with mock.patch(
+            "main.management.commands.restore_db.get_pg_dump_version", return_value=16
+        ):
+            self.command.validate_arguments(
+                source="test", target="local", file_name="file.dump", compress="lz4"
+            )
+        mock_exit.assert_not_called()
+
+    @mock.patch("main.management.commands.restore_db.subprocess.check_call")
+    @mock.patch(
+        "main.management.commands.restore_db.get_table_sizes",
+        return_value=[
+            ("public", "main_notification", True, 3 * 2**30, 2 * 2**30),
+            ("public", "users_user", True, 2**30, 2**29),
+            ("public", "main_contact", True, 2**29, 2**29),
+        ],
+    )
+    def test_dry_run(self, mock_table_sizes, mock_check_call):
+        """Test that the dry run estimates the size of the dump without running anything."""
+        out = StringIO()
+        call_command(
+            "restore_db",
+            "--dry-run",
+            "--profile=slim",
+            "--compress=none",
+            source="test",
+            target="local",
+            stdout=out,
+        )
+        mock_check_call.assert_not_called()
+        self.assertIn("\t- main_notification: 3.0 GiB", out.getvalue())
+        self.assertIn(
+            "3 tables take 4.5 GiB with indexes, 1.0 GiB of it is dumped as table data. "
+            "Estimated dump size with none compression: 1.0 GiB.",
+            out.getvalue(),
+        )
+
+    def test_dry_run_table_sizes(self):
+        """Test that the table sizes are read from the test database."""
+        settings_dict = connection.settings_dict
+        with mock.patch.dict(
+            Command.DATABASE_CONFIG["test"],
+            host=settings_dict["HOST"],
+            dbname=settings_dict["NAME"],
+            username=settings_dict["USER"],
+            password=settings_dict["PASSWORD"],
+        ):
+            call_command(
+                "restore_db",
+                "--dry-run",
+                "--include-table=users_*",
+                source="test",
+                target="local",
+                stdout=self.command.stdout,
+            )
+        self.assertIn("- users_user:", self.command.stdout.getvalue())
+        self.assertNotIn("- main_contact:", self.command.stdout.getvalue())
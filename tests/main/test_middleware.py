@@ -0,0 +1,80 @@
+from django.core.cache import cache
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+from django.test import TestCase, RequestFactory, override_settings
+from django.urls import reverse
+
+from main.middleware import NotificationMiddleware
+from tests.factories.main import NotificationFactory
+from tests.factories.users import UserFactory
+
+
+class NotificationMiddlewareTest(TestCase):
+    """
+    Test the NotificationMiddleware.
+    """
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.user = UserFactory()
+        self.notifications = NotificationFactory.create_batch(2, user=self.user)
+        self.middleware = NotificationMiddleware(lambda request: HttpResponse())
+
+    def get_unread_notifications(self, user):
+        """
+        Run a request for the given user through the middleware and return the attached accessor.
+        """
+        request = RequestFactory().get("/")
+        request.user = user
+        self.middleware(request)
+        return getattr(request, "unread_notifications")
+
+    def test_anonymous_request(self):
+        """
+        Test that anonymous requests see no notifications.
+        """
+        unread = self.get_unread_notifications(AnonymousUser())
+        with self.assertNumQueries(0):
+            self.assertEqual(unread.count, 0)
+            self.assertEqual(unread.latest, [])
+            self.assertFalse(unread)
+
+    def test_untouched_request_does_not_query(self):
+        """
+        Test that nothing is looked up when the notifications are never accessed.
+        """
+        with self.assertNumQueries(0):
+            self.get_unread_notifications(self.user)
+
+    def test_values_are_memoised(self):
+        """
+        Test that a cold cache costs a single query and the values are resolved once per request.
+        """
+        unread = self.get_unread_notifications(self.user)
+        with self.assertNumQueries(1):
+            self.assertEqual(unread.count, 2)
+            self.assertEqual(unread.latest, self.notifications[::-1])
+            self.assertEqual(list(unread), self.notifications[::-1])
+            self.assertTrue(unread)
+
+    @override_settings(NOTIFICATION_DROPDOWN_LIMIT=2)
+    def test_full_dropdown_counts_separately(self):
+        """
+        Test that a full dropdown falls back to a bounded count query.
+        """
+        NotificationFactory(user=self.user)
+        unread = self.get_unread_notifications(self.user)
+        with self.assertNumQueries(2):
+            self.assertEqual(unread.count, 3)
+            self.assertEqual(len(unread.latest), 2)
+
+    def test_authenticated_page(self):
+        """
+        Test that the navbar renders the unread notifications of the user.
+        """
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("home"))
+        unread = getattr(response.wsgi_request, "unread_notifications")
+        self.assertEqual(unread.count, 2)
+        self.assertContains(response, self.notifications[0].title)
@@ -1,10 +1,16 @@
 from unittest.mock import patch
 
+from django.contrib.auth import get_user_model
 from django.contrib.auth.models import User
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection, transaction
 from django.urls import reverse
 from auditlog.registry import auditlog
 
+from main.consts import EmailStatus
+
 from main.models import (
     TermsAndConditions,
     PrivacyPolicy,
@@ -12,7 +18,9 @@ from main.models import (
     AuditLogConfig,
     Notification,
     SocialMediaLink,
+    OutgoingEmail,
 )
+from main.models.notification import LATEST_UNREAD_CACHE_KEY, UNREAD_COUNT_CACHE_KEY
 
 from tests.factories.main import NotificationFactory, SocialMediaLinkFactory
 from tests.factories.users import UserFactory
@@ -35,6 +43,44 @@ class TermsAndConditionsTest(TestCase):
         )
 
 
+class CurrentVersionManagerTest(TestCase):
+    """
+    Test the cached current version of the TermsAndConditions and PrivacyPolicy models.
+    """
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def test_current_is_cached(self):
+        """
+        Test that the current version only queries the database on a cold cache.
+        """
+        TermsAndConditions.objects.create(terms="Old Terms")
+        terms = TermsAndConditions.objects.create(terms="New Terms")
+        with self.assertNumQueries(1):
+            self.assertEqual(TermsAndConditions.objects.current(), terms)
+        with self.assertNumQueries(0):
+            self.assertEqual(TermsAndConditions.objects.current(), terms)
+
+    def test_new_version_invalidates_cache(self):
+        """
+        Test that saving a new version makes it the current one.
+        """
+        PrivacyPolicy.objects.create(policy="Old Policy")
+        PrivacyPolicy.objects.current()
+        with self.captureOnCommitCallbacks(execute=True):
+            policy = PrivacyPolicy.objects.create(policy="New Policy")
+        self.assertEqual(PrivacyPolicy.objects.current(), policy)
+
+    def test_current_without_versions(self):
+        """
+        Test that a missing document raises DoesNotExist.
+        """
+        with self.assertRaises(PrivacyPolicy.DoesNotExist):
+            PrivacyPolicy.objects.current()
+
+
 class PrivacyPolicyTest(TestCase):
     """
     Test the PrivacyPolicy model.
@@ -158,8 +204,284 @@ class NotificationTest(TestCase):
         Test the mark_as_read method of the Notification model.
         """
         self.assertFalse(self.notification.is_read)
-        self.notification.mark_as_read()
+        with self.assertNumQueries(1):
+            self.assertTrue(self.notification.mark_as_read())
         self.assertTrue(self.notification.is_read)
+        self.notification.refresh_from_db()
+        self.assertTrue(self.notification.is_read)
+
+    def test_mark_as_read_already_read(self):
+        """
+        Test that marking a read notification again reports that nothing changed.
+        """
+        self.notification.mark_as_read()
+        self.assertFalse(self.notification.mark_as_read())
+
+    def test_manager_mark_as_read_with_link(self):
+        """
+        Test that the manager only marks the notification when the link matches.
+        """
+        self.assertFalse(
+            Notification.objects.mark_as_read(
+                self.notification.pk, link="https://other.example.com"
+            )
+        )
+        self.assertTrue(
+            Notification.objects.mark_as_read(
+                self.notification.pk, link=self.notification.link
+            )
+        )
+
+    def test_mark_all_as_read(self):
+        """
+        Test that all unread notifications of the user are marked in one statement.
+        """
+        NotificationFactory(user=self.user)
+        other_notification = NotificationFactory()
+        with self.assertNumQueries(1):
+            self.assertEqual(Notification.objects.mark_all_as_read(self.user.pk), 2)
+        self.assertFalse(Notification.objects.unread(self.user.pk).exists())
+        other_notification.refresh_from_db()
+        self.assertFalse(other_notification.is_read)
+
+
+class NotificationManagerTest(TestCase):
+    """
+    Test the cached unread lookups of the Notification manager.
+    """
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.user = UserFactory()
+        self.notifications = NotificationFactory.create_batch(3, user=self.user)
+        NotificationFactory(user=self.user, is_read=True)
+
+    def test_unread_count_is_cached(self):
+        """
+        Test that the unread count only queries the database on a cold cache.
+        """
+        with self.assertNumQueries(1), self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(Notification.objects.unread_count(self.user.pk), 3)
+        with self.assertNumQueries(0):
+            self.assertEqual(Notification.objects.unread_count(self.user.pk), 3)
+
+    def test_unread_values_cached_after_commit(self):
+        """
+        Test that values read inside a transaction are only cached once it commits.
+        """
+        with self.captureOnCommitCallbacks() as callbacks:
+            Notification.objects.unread_count(self.user.pk)
+            Notification.objects.latest_unread(self.user.pk)
+        self.assertIsNone(cache.get(UNREAD_COUNT_CACHE_KEY.format(self.user.pk)))
+        self.assertIsNone(cache.get(LATEST_UNREAD_CACHE_KEY.format(self.user.pk)))
+        for callback in callbacks:
+            callback()
+        self.assertEqual(cache.get(UNREAD_COUNT_CACHE_KEY.format(self.user.pk)), 3)
+
+    def test_rolled_back_read_not_cached(self):
+        """
+        Test that a count including uncommitted notifications is not cached when the transaction rolls back.
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                NotificationFactory(user=self.user)
+                self.assertEqual(Notification.objects.unread_count(self.user.pk), 4)
+                raise RuntimeError
+        self.assertIsNone(cache.get(UNREAD_COUNT_CACHE_KEY.format(self.user.pk)))
+        self.assertEqual(Notification.objects.unread_count(self.user.pk), 3)
+
+    def test_unread_count_from_latest(self):
+        """
+        Test that no count query is needed when the latest notifications do not fill the dropdown.
+        """
+        latest = Notification.objects.latest_unread(self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                Notification.objects.unread_count(self.user.pk, latest=latest), 3
+            )
+
+    @override_settings(NOTIFICATION_BADGE_LIMIT=2)
+    def test_unread_count_is_capped(self):
+        """
+        Test that the unread count stops counting at the badge limit.
+        """
+        self.assertEqual(Notification.objects.unread_count(self.user.pk), 2)
+
+    def test_new_notification_increments_cached_count(self):
+        """
+        Test that creating an unread notification bumps the cached count.
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            Notification.objects.unread_count(self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            NotificationFactory(user=self.user)
+        with self.assertNumQueries(0):
+            self.assertEqual(Notification.objects.unread_count(self.user.pk), 4)
+
+    def test_save_invalidates_cache(self):
+        """
+        Test that saving an existing notification drops the cached values.
+        """
+        Notification.objects.unread_count(self.user.pk)
+        notification = self.notifications[0]
+        notification.is_read = True
+        with self.captureOnCommitCallbacks(execute=True):
+            notification.save()
+        with self.assertNumQueries(1):
+            self.assertEqual(Notification.objects.unread_count(self.user.pk), 2)
+
+    def test_mark_as_read_invalidates_cache(self):
+        """
+        Test that reading a notification drops the cached values.
+        """
+        Notification.objects.unread_count(self.user.pk)
+        Notification.objects.latest_unread(self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.notifications[0].mark_as_read()
+        self.assertEqual(Notification.objects.unread_count(self.user.pk), 2)
+        self.assertNotIn(
+            self.notifications[0], Notification.objects.latest_unread(self.user.pk)
+        )
+
+    def test_mark_as_read_without_owner_invalidates_cache(self):
+        """
+        Test that the cached values of the owner are dropped when the owner is not passed.
+        """
+        Notification.objects.unread_count(self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            Notification.objects.mark_as_read(self.notifications[0].pk)
+        self.assertEqual(Notification.objects.unread_count(self.user.pk), 2)
+
+    def test_mark_all_as_read_invalidates_cache(self):
+        """
+        Test that reading all notifications drops the cached values.
+        """
+        Notification.objects.unread_count(self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            Notification.objects.mark_all_as_read(self.user.pk)
+        self.assertEqual(Notification.objects.unread_count(self.user.pk), 0)
+
+    def test_delete_invalidates_cache(self):
+        """
+        Test that deleting an unread notification drops the cached values.
+        """
+        Notification.objects.unread_count(self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.notifications[0].delete()
+        self.assertEqual(Notification.objects.unread_count(self.user.pk), 2)
+
+    @override_settings(NOTIFICATION_DROPDOWN_LIMIT=2)
+    def test_latest_unread_is_bounded_and_cached(self):
+        """
+        Test that the latest unread notifications are limited, newest first and cached.
+        """
+        with self.assertNumQueries(1), self.captureOnCommitCallbacks(execute=True):
+            latest = Notification.objects.latest_unread(self.user.pk)
+        self.assertEqual(latest, self.notifications[:0:-1])
+        with self.assertNumQueries(0):
+            Notification.objects.latest_unread(self.user.pk)
+
+
+class NotificationUnreadIndexTest(TestCase):
+    """
+    Test that the unread notification queries use the partial index.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.user = UserFactory()
+        # A long read history, as the index is meant to skip it
+        Notification.objects.bulk_notify(
+            [self.user] * 1000, "Read", "Message", "https://example.com"
+        )
+        Notification.objects.mark_all_as_read(self.user.pk)
+        NotificationFactory.create_batch(3, user=self.user)
+        with connection.cursor() as cursor:
+            # The test table is tiny, so keep the planner from preferring a sequential or bitmap scan
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            cursor.execute("SET LOCAL enable_bitmapscan = off")
+            cursor.execute("ANALYZE main_notification")
+
+    def test_latest_unread_uses_index(self):
+        """
+        Test that the dropdown query is served by the index without sorting.
+        """
+        plan = (
+            Notification.objects.unread(self.user.pk)
+            .order_by("-created_at")[:10]
+            .explain()
+        )
+        self.assertIn("notification_unread_user_idx", plan)
+        self.assertNotIn("Sort", plan)
+
+    def test_unread_count_uses_index(self):
+        """
+        Test that the badge count query is served by the index.
+        """
+        plan = Notification.objects.unread(self.user.pk)[:100].explain()
+        self.assertIn("notification_unread_user_idx", plan)
+
+
+class NotificationBulkNotifyTest(TestCase):
+    """
+    Test the bulk_notify method of the Notification manager.
+    """
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.users = UserFactory.create_batch(5)
+
+    def test_bulk_notify_queryset(self):
+        """
+        Test that every user of a queryset gets the notification.
+        """
+        users = get_user_model().objects.filter(pk__in=[u.pk for u in self.users])
+        created = Notification.objects.bulk_notify(
+            users, "Title", "Message", "https://example.com", "warning"
+        )
+        self.assertEqual(created, 5)
+        notifications = Notification.objects.filter(title="Title")
+        self.assertEqual(
+            set(notifications.values_list("user_id", flat=True)),
+            {u.pk for u in self.users},
+        )
+        self.assertTrue(all(n.type == "warning" for n in notifications))
+        self.assertTrue(all(n.created_at for n in notifications))
+
+    def test_bulk_notify_iterable(self):
+        """
+        Test that users and user ids can be mixed in a plain iterable.
+        """
+        created = Notification.objects.bulk_notify(
+            [self.users[0], self.users[1].pk], "Title", "Message", "https://example.com"
+        )
+        self.assertEqual(created, 2)
+        self.assertEqual(Notification.objects.filter(title="Title").count(), 2)
+
+    def test_bulk_notify_inserts_in_batches(self):
+        """
+        Test that one INSERT is issued per batch.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            Notification.objects.bulk_notify(
+                self.users, "Title", "Message", "https://example.com", batch_size=2
+            )
+        inserts = [q for q in queries if q["sql"].startswith("INSERT")]
+        self.assertEqual(len(inserts), 3)
+
+    def test_bulk_notify_invalidates_cache(self):
+        """
+        Test that the cached unread values of the notified users are dropped.
+        """
+        user = self.users[0]
+        self.assertEqual(Notification.objects.unread_count(user.pk), 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            Notification.objects.bulk_notify(
+                [user], "Title", "Message", "https://example.com"
+            )
+        self.assertEqual(Notification.objects.unread_count(user.pk), 1)
 
 
 class SocialMediaLinkTest(TestCase):
@@ -200,3 +522,43 @@ class SocialMediaLinkTest(TestCase):
         social_media_link = SocialMediaLinkFactory()
         self.assertIsNotNone(social_media_link.created_at)
         self.assertIsNotNone(social_media_link.updated_at)
+
+
+@override_settings(DEFAULT_FROM_EMAIL="admin@example.com")
+class OutgoingEmailTest(TestCase):
+    """
+    Test the OutgoingEmail model.
+    """
+
+    def test_queue(self):
+        """
+        Test that queueing an email creates one pending row per recipient.
+        """
+        with self.assertNumQueries(1):
+            emails = OutgoingEmail.objects.queue(
+                "Subject", "Message", ["a@example.com", "b@example.com"]
+            )
+        self.assertEqual(len(emails), 2)
+        self.assertEqual(
+            set(
+                OutgoingEmail.objects.filter(
+                    status=EmailStatus.PENDING.value
+                ).values_list("recipient", flat=True)
+            ),
+            {"a@example.com", "b@example.com"},
+        )
+        self.assertEqual(emails[0].from_email, "admin@example.com")
+
+    def test_as_message_and_str(self):
+        """
+        Test the message conversion and string representation.
+        """
+        (email,) = OutgoingEmail.objects.queue(
+            "Subject", "Message", ["a@example.com"], from_email="from@example.com"
+        )
+        message = email.as_message()
+        self.assertEqual(message.subject, "Subject")
+        self.assertEqual(message.body, "Message")
+        self.assertEqual(message.from_email, "from@example.com")
+        self.assertEqual(message.to, ["a@example.com"])
+        self.assertEqual(str(email), "Subject - a@example.com")
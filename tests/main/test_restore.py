@@ -0,0 +1,438 @@
+import os
+import sys
+from datetime import datetime, timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from main.management.commands.restore_db import Command
+from main.management.restore import (
+    DumpCache,
+    MediaSync,
+    format_size,
+    get_compress_args,
+    get_compress_method,
+    get_maintenance_phases,
+    get_pg_dump_version,
+    get_stream_args,
+    get_tuned_env,
+    is_valid_compress,
+    matches_table_pattern,
+    stream_dump,
+)
+from tests.base import make_temp_dir
+
+DB_CONFIG = {"host": "db", "username": "user", "dbname": "name"}
+
+
+class CompressTest(TestCase):
+    """
+    Test suite for the compression helpers of restore_db.
+    """
+
+    def test_get_compress_args(self):
+        """Test that every --compress value becomes the matching pg_dump argument."""
+        self.assertEqual(get_compress_args(None), [])
+        self.assertEqual(get_compress_args("gzip"), [])
+        self.assertEqual(get_compress_args("none"), ["--compress=0"])
+        self.assertEqual(get_compress_args("6"), ["--compress=6"])
+        self.assertEqual(get_compress_args("gzip:1"), ["--compress=1"])
+        self.assertEqual(get_compress_args("lz4"), ["--compress=lz4"])
+        self.assertEqual(get_compress_args("zstd:3"), ["--compress=zstd:3"])
+
+    def test_get_compress_method(self):
+        """Test that a level of 0 means no compression."""
+        self.assertEqual(get_compress_method(None), "gzip")
+        self.assertEqual(get_compress_method("0"), "none")
+        self.assertEqual(get_compress_method("zstd:3"), "zstd")
+
+    @mock.patch(
+        "main.management.restore.subprocess.check_output",
+        return_value="pg_dump (PostgreSQL) 16.2\n",
+    )
+    def test_get_pg_dump_version(self, mock_check_output):
+        """Test that the major version of pg_dump is read from its version output."""
+        self.assertEqual(get_pg_dump_version(), 16)
+        mock_check_output.side_effect = FileNotFoundError
+        self.assertEqual(get_pg_dump_version(), 0)
+
+    def test_format_size(self):
+        """Test that sizes are shown in the largest fitting unit."""
+        self.assertEqual(format_size(512), "512.0 B")
+        self.assertEqual(format_size(3 * 2**30 / 2), "1.5 GiB")
+        self.assertEqual(format_size(2 * 2**40), "2.0 TiB")
+
+    def test_is_valid_compress(self):
+        """Test that the level of a compression method is checked against the range pg_dump accepts."""
+        for compress in ("none", "gzip:0", "gzip:9", "7", "lz4:1", "lz4:12", "zstd:22"):
+            self.assertTrue(is_valid_compress(compress), compress)
+        for compress in ("none:5", "gzip:15", "lz4:0", "lz4:99", "zstd:23", "10", "br"):
+            self.assertFalse(is_valid_compress(compress), compress)
+
+
+class StreamDumpTest(TestCase):
+    """
+    Test suite for piping pg_dump into pg_restore.
+    """
+
+    def setUp(self):
+        """
+        Set up the test suite.
+        :return: None
+        """
+        self.output_file = os.path.join(make_temp_dir(self), "restored")
+        # Stand-in for pg_restore writing everything it reads to a file
+        self.restore_args = [
+            sys.executable,
+            "-c",
+            "import shutil, sys; shutil.copyfileobj(sys.stdin.buffer, open(sys.argv[1], 'wb'))",
+            self.output_file,
+        ]
+        self.progress = []
+
+    def dump_args(self, script: str):
+        """Return the arguments of a stand-in for pg_dump running the given script."""
+        return [sys.executable, "-c", "import sys; out = sys.stdout.buffer; " + script]
+
+    def stream(self, dump_args, restore_args=None):
+        """Stream the dump into the stand-in for pg_restore, recording the progress."""
+        return stream_dump(
+            dump_args,
+            restore_args or self.restore_args,
+            {},
+            {},
+            self.progress.append,
+        )
+
+    def test_stream_dump_success(self):
+        """Test that the whole dump reaches pg_restore and the progress is reported."""
+        dump_args = self.dump_args("out.write(b'x' * 3 * 2**20)")
+        self.assertEqual(self.stream(dump_args), (True, 0))
+        self.assertEqual(os.path.getsize(self.output_file), 3 * 2**20)
+        self.assertEqual(self.progress, [3 * 2**20])
+
+    def test_stream_dump_failure(self):
+        """Test that a failing pg_dump is reported as a failed stream."""
+        dump_args = self.dump_args("out.write(b'x'); sys.exit(1)")
+        self.assertFalse(self.stream(dump_args)[0])
+
+    def test_stream_restore_exits_early(self):
+        """Test that pg_restore exiting before the end of the dump stops the stream."""
+        dump_args = self.dump_args("out.write(b'x' * 16 * 2**20)")
+        restore_args = [sys.executable, "-c", "import sys; sys.exit(1)"]
+        self.assertEqual(self.stream(dump_args, restore_args), (False, 1))
+
+    def test_stream_dump_progress(self):
+        """Test that the progress is reported every interval and once more for the rest of the dump."""
+        dump_args = self.dump_args("out.write(b'x' * (5 * 2**20 + 1))")
+        with mock.patch(
+            "main.management.restore.STREAM_PROGRESS_INTERVAL", 2 * 2**20
+        ):
+            self.assertEqual(self.stream(dump_args), (True, 0))
+        self.assertEqual(self.progress, [2 * 2**20, 4 * 2**20, 5 * 2**20 + 1])
+
+    def test_stream_dump_cannot_start(self):
+        """Test that a pg_restore which cannot be started is reported as a failed stream."""
+        dump_args = self.dump_args("out.write(b'x')")
+        restore_args = [os.path.join(make_temp_dir(self), "pg_restore")]
+        self.assertEqual(self.stream(dump_args, restore_args), (False, None))
+
+    def test_get_stream_args(self):
+        """Test that the table and compression arguments are passed on to the streamed pg_dump."""
+        dump_args, restore_args = get_stream_args(
+            DB_CONFIG,
+            DB_CONFIG,
+            ["--exclude-table-data=main_notification"],
+            compress="none",
+        )
+        self.assertEqual(dump_args[:2], ["pg_dump", "-Fc"])
+        self.assertEqual(
+            dump_args[-2:], ["--compress=0", "--exclude-table-data=main_notification"]
+        )
+        self.assertEqual(restore_args[:2], ["pg_restore", "--no-owner"])
+
+
+class TablePatternTest(TestCase):
+    """
+    Test suite for matching tables against pg_dump table patterns.
+    """
+
+    def test_unquoted_pattern(self):
+        """Test that unquoted patterns are folded to lower case and use the pg_dump wildcards."""
+        self.assertTrue(matches_table_pattern("users_*", "public", "users_user", True))
+        self.assertTrue(
+            matches_table_pattern("USERS_USE?", "public", "users_user", True)
+        )
+        self.assertTrue(
+            matches_table_pattern("main_(contact|faq)", "public", "main_faq", True)
+        )
+        self.assertFalse(matches_table_pattern("users", "public", "users_user", True))
+        self.assertFalse(
+            matches_table_pattern("users_user$", "public", "users_user", True)
+        )
+
+    def test_schema_and_visibility(self):
+        """Test that a dot separates the schema and tables off the search path need it."""
+        self.assertFalse(matches_table_pattern("users_*", "audit", "users_user", False))
+        self.assertTrue(
+            matches_table_pattern("audit.users_*", "audit", "users_user", False)
+        )
+        self.assertTrue(
+            matches_table_pattern("*.users_user", "public", "users_user", True)
+        )
+        self.assertFalse(matches_table_pattern("audit.*", "public", "users_user", True))
+
+    def test_quoted_pattern(self):
+        """Test that quoted text keeps its case and is matched literally."""
+        self.assertTrue(matches_table_pattern('"Users"', "public", "Users", True))
+        self.assertFalse(matches_table_pattern("Users", "public", "Users", True))
+        self.assertTrue(matches_table_pattern('"a.b*"', "public", "a.b*", True))
+        self.assertFalse(matches_table_pattern('"a.b*"', "public", "a.bc", True))
+        self.assertTrue(
+            matches_table_pattern('"say ""hi"""', "public", 'say "hi"', True)
+        )
+
+
+class MaintenanceTest(TestCase):
+    """
+    Test suite for the session tuning and the maintenance after a restore.
+    """
+
+    def test_get_maintenance_phases(self):
+        """Test that the tables are analyzed, or vacuumed, with the given jobs."""
+        self.assertEqual(
+            get_maintenance_phases(DB_CONFIG, 4, vacuum=False),
+            {
+                "Analyze": [
+                    "vacuumdb --analyze-only --jobs=4 --host=db --port=5432 --username=user --dbname=name"
+                ]
+            },
+        )
+        phases = get_maintenance_phases(DB_CONFIG, 2, vacuum=True)
+        self.assertIn("vacuumdb --analyze --jobs=2 --host=db", phases["Vacuum"][0])
+
+    def test_get_tuned_env(self):
+        """Test that the restore sessions are tuned on top of the existing PGOPTIONS."""
+        env = {"PGOPTIONS": "-c statement_timeout=0"}
+        self.assertEqual(
+            get_tuned_env(env, "2GB")["PGOPTIONS"],
+            "-c statement_timeout=0 -c maintenance_work_mem=2GB -c synchronous_commit=off",
+        )
+        self.assertEqual(env, {"PGOPTIONS": "-c statement_timeout=0"})
+        self.assertEqual(
+            get_tuned_env({}, "1GB")["PGOPTIONS"],
+            "-c maintenance_work_mem=1GB -c synchronous_commit=off",
+        )
+
+
+class DumpCacheTest(TestCase):
+    """
+    Test suite for the dump cache of the restore_db command.
+    """
+
+    def setUp(self):
+        """
+        Set up the test suite.
+        :return: None
+        """
+        self.dump_cache = DumpCache(make_temp_dir(self))
+        self.key = DumpCache.get_key(None, [])
+
+    def create_dump(self, minutes_ago: int = 0, content: bytes = b"dump") -> str:
+        """Create a complete cached dump of the test database."""
+        created_at = datetime.now() - timedelta(minutes=minutes_ago)
+        path = os.path.join(
+            self.dump_cache.directory,
+            f"test-{self.key}-{created_at.strftime(DumpCache.TIMESTAMP_FORMAT)}.dump",
+        )
+        with open(path, "wb") as file:
+            file.write(content)
+        self.dump_cache.store(path)
+        return path
+
+    def test_key_depends_on_dump_options(self):
+        """Test that dumps with other formats or tables are cached apart."""
+        self.assertNotEqual(self.key, DumpCache.get_key(4, []))
+        self.assertNotEqual(self.key, DumpCache.get_key(None, ["--table=users_user"]))
+
+    def test_find_recent_dump(self):
+        """Test that the newest complete dump within the maximum age is found."""
+        self.create_dump(minutes_ago=30)
+        path = self.create_dump(minutes_ago=10)
+        self.assertEqual(self.dump_cache.find("test", self.key, max_age=60), path)
+        self.assertIsNone(self.dump_cache.find("test", self.key, max_age=5))
+        self.assertIsNone(self.dump_cache.find("develop", self.key, max_age=60))
+
+    def test_find_skips_corrupted_dump(self):
+        """Test that a dump not matching its checksum is not reused."""
+        older_path = self.create_dump(minutes_ago=30)
+        path = self.create_dump(minutes_ago=10)
+        with open(path, "ab") as file:
+            file.write(b"corrupted")
+        self.assertFalse(self.dump_cache.verify(path))
+        self.assertEqual(self.dump_cache.find("test", self.key, max_age=60), older_path)
+
+    def test_incomplete_dump_not_reused(self):
+        """Test that a dump without a checksum is not reused."""
+        path = self.dump_cache.new_path("test", self.key)
+        with open(path, "wb") as file:
+            file.write(b"partial")
+        self.assertIsNone(self.dump_cache.find("test", self.key, max_age=60))
+
+    def test_directory_dump_checksum(self):
+        """Test that the checksum of a directory format dump covers all of its files."""
+        path = self.dump_cache.new_path("test", self.key)
+        os.makedirs(path)
+        for name in ("toc.dat", "3001.dat.gz"):
+            with open(os.path.join(path, name), "wb") as file:
+                file.write(name.encode())
+        self.dump_cache.store(path)
+        self.assertTrue(self.dump_cache.verify(path))
+        with open(os.path.join(path, "toc.dat"), "ab") as file:
+            file.write(b"changed")
+        self.assertFalse(self.dump_cache.verify(path))
+
+    def test_evict(self):
+        """Test that only the newest dumps are kept."""
+        paths = [self.create_dump(minutes_ago=minutes) for minutes in (30, 20, 10)]
+        self.dump_cache.evict("test", self.key, keep=2)
+        self.assertFalse(os.path.exists(paths[0]))
+        self.assertFalse(os.path.exists(f"{paths[0]}.sha256"))
+        self.assertTrue(all(os.path.exists(path) for path in paths[1:]))
+
+    def test_evict_directory_dump(self):
+        """Test that an evicted directory format dump is removed with all of its files."""
+        path = self.create_dump(minutes_ago=30)
+        os.remove(path)
+        os.makedirs(os.path.join(path, "toc"))
+        self.create_dump(minutes_ago=10)
+        self.dump_cache.evict("test", self.key, keep=1)
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(os.path.exists(f"{path}.sha256"))
+
+    def test_get_dumps_without_directory(self):
+        """Test that a cache directory that was never created has no dumps."""
+        dump_cache = DumpCache(os.path.join(self.dump_cache.directory, "missing"))
+        self.assertEqual(dump_cache.get_dumps("test", self.key), [])
+
+    def test_get_dumps_skips_invalid_timestamp(self):
+        """Test that a file named like a dump without a valid timestamp is ignored."""
+        path = self.create_dump()
+        with open(
+            os.path.join(self.dump_cache.directory, f"test-{self.key}-latest.dump"),
+            "wb",
+        ):
+            pass
+        self.assertEqual(
+            [dump for _, dump in self.dump_cache.get_dumps("test", self.key)], [path]
+        )
+
+
+class MediaSyncTest(TestCase):
+    """
+    Test suite for the incremental media sync of restore_db --copy-media.
+    """
+
+    def setUp(self):
+        """
+        Set up the test suite.
+        :return: None
+        """
+        self.source_root = make_temp_dir(self)
+        self.target_root = make_temp_dir(self)
+        self.media_sync = MediaSync(self.source_root, self.target_root, workers=2)
+        self.write(self.source_root, "images/first.jpg", b"first")
+        self.write(self.source_root, "second.jpg", b"second")
+
+    @staticmethod
+    def write(root, relative_path, content):
+        """Write a media file below the given root."""
+        path = os.path.join(root, relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as file:
+            file.write(content)
+
+    def read(self, relative_path):
+        """Return the content of a synced media file."""
+        with open(os.path.join(self.target_root, relative_path), "rb") as file:
+            return file.read()
+
+    def test_new_files_copied(self):
+        """Test that files missing locally are copied."""
+        stats = self.media_sync.sync()
+        self.assertEqual(stats, {"copied": 2, "skipped": 0, "failed": 0, "bytes": 11})
+        self.assertEqual(self.read("images/first.jpg"), b"first")
+        self.assertEqual(self.read("second.jpg"), b"second")
+
+    def test_unchanged_files_skipped_without_reading(self):
+        """Test that a re-run skips the files of the manifest without hashing them."""
+        self.media_sync.sync()
+        with mock.patch("main.management.restore.file_checksum") as mock_checksum:
+            stats = self.media_sync.sync()
+        mock_checksum.assert_not_called()
+        self.assertEqual(stats["copied"], 0)
+        self.assertEqual(stats["skipped"], 2)
+
+    def test_changed_file_copied(self):
+        """Test that only a file changed in the source is copied again."""
+        self.media_sync.sync()
+        self.write(self.source_root, "second.jpg", b"changed!")
+        stats = self.media_sync.sync()
+        self.assertEqual(stats["copied"], 1)
+        self.assertEqual(stats["skipped"], 1)
+        self.assertEqual(self.read("second.jpg"), b"changed!")
+
+    def test_identical_local_file_skipped(self):
+        """Test that a local file with the same content is not copied, even without a manifest."""
+        self.write(self.target_root, "second.jpg", b"second")
+        stats = self.media_sync.sync()
+        self.assertEqual(stats["copied"], 1)
+        self.assertEqual(stats["skipped"], 1)
+
+    def test_failed_copy_removed(self):
+        """Test that a failed copy is counted and leaves neither a partial nor a target file behind."""
+
+        def copyfile(source_path, target_path):
+            with open(target_path, "wb") as file:
+                file.write(b"trunc")
+            raise OSError("No space left on device")
+
+        with mock.patch("main.management.restore.shutil.copyfile", copyfile):
+            stats = self.media_sync.sync()
+        self.assertEqual(stats["failed"], 2)
+        files = [name for _, _, names in os.walk(self.target_root) for name in names]
+        self.assertEqual(files, [MediaSync.MANIFEST_NAME])
+        self.assertEqual(self.media_sync.load_manifest(), {})
+
+    @mock.patch("main.management.commands.restore_db.subprocess.check_call")
+    @mock.patch(
+        "main.management.commands.restore_db.os.path.exists", return_value=False
+    )
+    def test_handle_copy_media(self, mock_exists, mock_check_call):
+        """Test that restore_db --copy-media syncs the media of the source after the restore."""
+        out = StringIO()
+        with mock.patch.dict(Command.MEDIA_ROOTS, {"test": self.source_root}):
+            with override_settings(DEBUG=True, MEDIA_ROOT=self.target_root):
+                call_command(
+                    "restore_db",
+                    "--no-input",
+                    "--copy-media",
+                    source="test",
+                    target="local",
+                    stdout=out,
+                )
+        mock_exists.assert_called()
+        mock_check_call.assert_called()
+        self.assertIn("Copied 2 media files", out.getvalue())
+        self.assertEqual(self.read("second.jpg"), b"second")
+
+    @mock.patch("main.management.commands.restore_db.sys.exit")
+    def test_validate_arguments_copy_media_needs_media_root(self, mock_exit):
+        """Test that --copy-media needs a source with a configured media directory."""
+        with mock.patch.dict(Command.MEDIA_ROOTS, {"test": ""}):
+            Command(stdout=StringIO()).validate_arguments(
+                source="test", target="local", file_name="file.dump", copy_media=True
+            )
+        mock_exit.assert_called_once_with(1)
@@ -0,0 +1,143 @@
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+
+from main.middleware import PRIMARY_PIN_COOKIE_NAME, ReplicaRoutingMiddleware
+from main.models import Contact
+from main.routers import ReplicaRouter, replica_reads, wrote_to_primary
+from tests.factories.users import UserFactory
+
+
+@override_settings(REPLICA_ROUTED_MODELS=["main.contact"])
+class ReplicaRouterTest(TestCase):
+    """
+    Test cases for the routing of reads to the replica.
+    """
+
+    databases = {"default", "replica"}
+
+    def setUp(self):
+        super().setUp()
+        Contact.objects.using("default").create(
+            name="Primary", email="primary@example.com", subject="Subject"
+        )
+        Contact.objects.using("replica").create(
+            name="Replica", email="replica@example.com", subject="Subject"
+        )
+
+    def test_reads_outside_requests_use_primary(self):
+        """
+        Test that reads outside of a `replica_reads` block, e.g. in tasks, go to the primary.
+        """
+        self.assertEqual(Contact.objects.get().name, "Primary")
+
+    def test_routed_model_read_from_replica(self):
+        """
+        Test that routed models are read from the replica and other models from the primary.
+        """
+        user = UserFactory()
+        with replica_reads():
+            self.assertEqual(Contact.objects.get().name, "Replica")
+            self.assertEqual(type(user).objects.get(pk=user.pk), user)
+
+    def test_pinned_reads_use_primary(self):
+        """
+        Test that pinned reads go to the primary.
+        """
+        with replica_reads(pinned=True):
+            self.assertEqual(Contact.objects.get().name, "Primary")
+
+    def test_write_pins_to_primary(self):
+        """
+        Test that a write goes to the primary and pins the following reads to it.
+        """
+        with replica_reads():
+            contact = Contact.objects.get()
+            self.assertFalse(wrote_to_primary())
+            contact.name = "Updated"
+            contact.save()
+            self.assertTrue(wrote_to_primary())
+            self.assertEqual(Contact.objects.get(pk=contact.pk).name, "Updated")
+        self.assertEqual(Contact.objects.using("replica").get().name, "Replica")
+
+    def test_allow_relation(self):
+        """
+        Test that relations are allowed across the primary and the replica only.
+        """
+        primary = Contact.objects.using("default").get()
+        replica = Contact.objects.using("replica").get()
+        other = Contact(name="Other")
+        other._state.db = "other"  # pylint: disable=protected-access
+        router = ReplicaRouter()
+        self.assertTrue(router.allow_relation(primary, replica))
+        self.assertIsNone(router.allow_relation(primary, other))
+
+
+@override_settings(REPLICA_ROUTED_MODELS=["main.contact"])
+class ReplicaRoutingMiddlewareTest(TestCase):
+    """
+    Test cases for the ReplicaRoutingMiddleware.
+    """
+
+    databases = {"default", "replica"}
+
+    def setUp(self):
+        super().setUp()
+        Contact.objects.using("replica").create(
+            name="Replica", email="replica@example.com", subject="Subject"
+        )
+        self.factory = RequestFactory()
+
+    def run_request(self, request, view=None):
+        """
+        Run a request through the middleware and return the response and the contact names the view read.
+        """
+        names = []
+
+        def get_response(request):
+            if view is not None:
+                view(request)
+            names.extend(Contact.objects.values_list("name", flat=True))
+            return HttpResponse()
+
+        response = ReplicaRoutingMiddleware(get_response)(request)
+        return response, names
+
+    def test_safe_request_reads_replica(self):
+        """
+        Test that a safe request reads from the replica and sets no cookie.
+        """
+        response, names = self.run_request(self.factory.get("/"))
+        self.assertEqual(names, ["Replica"])
+        self.assertNotIn(PRIMARY_PIN_COOKIE_NAME, response.cookies)
+
+    def test_unsafe_request_reads_primary(self):
+        """
+        Test that a request with an unsafe method reads from the primary.
+        """
+        _, names = self.run_request(self.factory.post("/"))
+        self.assertEqual(names, [])
+
+    def test_pin_cookie_reads_primary(self):
+        """
+        Test that a client that recently wrote reads from the primary.
+        """
+        request = self.factory.get("/")
+        request.COOKIES[PRIMARY_PIN_COOKIE_NAME] = "1"
+        _, names = self.run_request(request)
+        self.assertEqual(names, [])
+
+    def test_write_sets_pin_cookie(self):
+        """
+        Test that a request that writes pins the client to the primary for a while.
+        """
+
+        def view(request):
+            Contact.objects.create(
+                name="Primary", email="primary@example.com", subject="Subject"
+            )
+
+        response, names = self.run_request(self.factory.get("/"), view)
+        self.assertEqual(names, ["Primary"])
+        cookie = response.cookies[PRIMARY_PIN_COOKIE_NAME]
+        self.assertEqual(cookie["max-age"], 5)
+        self.assertTrue(cookie["httponly"])
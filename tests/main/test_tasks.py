@@ -1,8 +1,29 @@
+import json
 import smtplib
-from unittest.mock import patch
+from datetime import timedelta
+from unittest.mock import Mock, patch
 
-from django.test import TestCase
-from main.tasks import send_email_task
+from celery import current_app
+from django.core import mail
+from django.db.models.signals import post_delete
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from django_celery_results.backends import DatabaseBackend
+from django_celery_results.models import GroupResult, TaskResult
+
+from main.consts import EmailStatus
+from main.models import Notification, OutgoingEmail
+from main.tasks import (
+    close_email_connection,
+    drain_email_outbox_task,
+    send_email_task,
+    send_mass_email_task,
+    bulk_notify_task,
+    purge_read_notifications_task,
+    purge_task_results_task,
+)
+from tests.factories.main import NotificationFactory
+from tests.factories.users import UserFactory
 
 
 class TestSendEmailTask(TestCase):
@@ -10,12 +31,22 @@ class TestSendEmailTask(TestCase):
     Test the send_email_task.
     """
 
-    @patch("main.tasks.send_mail")
-    def test_send_email_success(self, mock_send_mail):
+    def setUp(self):
+        super().setUp()
+        close_email_connection()
+        patcher = patch("main.tasks.get_connection")
+        self.mock_get_connection = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(close_email_connection)
+        self.mock_connection = self.mock_get_connection.return_value
+
+    def test_send_email_success(self):
         """
         Test the send_email_task successfully sends an email.
         """
-        mock_send_mail.return_value = 1  # Simulate successful email send
+        self.mock_connection.send_messages.return_value = (
+            1  # Simulate successful email send
+        )
 
         subject = "Test Subject"
         message = "Test message"
@@ -24,16 +55,18 @@ class TestSendEmailTask(TestCase):
 
         task_result = send_email_task(subject, message, from_email, recipient_list)
         self.assertTrue(task_result)
-        mock_send_mail.assert_called_once_with(
-            subject, message, from_email, recipient_list
-        )
+        self.mock_connection.send_messages.assert_called_once()
+        (email,) = self.mock_connection.send_messages.call_args.args[0]
+        self.assertEqual(email.subject, subject)
+        self.assertEqual(email.body, message)
+        self.assertEqual(email.from_email, from_email)
+        self.assertEqual(email.to, recipient_list)
 
-    @patch("main.tasks.send_mail")
-    def test_send_email_failure(self, mock_send_mail):
+    def test_send_email_failure(self):
         """
         Test the send_email_task handling a failure in sending an email.
         """
-        mock_send_mail.side_effect = (
+        self.mock_connection.send_messages.side_effect = (
             smtplib.SMTPException
         )  # Simulate email send failure
 
@@ -44,6 +77,314 @@ class TestSendEmailTask(TestCase):
 
         task_result = send_email_task(subject, message, from_email, recipient_list)
         self.assertFalse(task_result)
-        mock_send_mail.assert_called_once_with(
-            subject, message, from_email, recipient_list
+        self.mock_connection.send_messages.assert_called_once()
+
+    def test_connection_reused_across_tasks(self):
+        """
+        Test that consecutive tasks share one opened connection.
+        """
+        send_email_task("Subject", "Message", "from@example.com", ["a@example.com"])
+        send_email_task("Subject", "Message", "from@example.com", ["b@example.com"])
+        self.mock_get_connection.assert_called_once()
+        self.mock_connection.open.assert_called_once()
+        self.assertEqual(self.mock_connection.send_messages.call_count, 2)
+
+    def test_reconnect_after_disconnect(self):
+        """
+        Test that a connection dropped by the server is reopened once.
+        """
+        self.mock_connection.send_messages.side_effect = [
+            smtplib.SMTPServerDisconnected,
+            1,
+        ]
+        task_result = send_email_task(
+            "Subject", "Message", "from@example.com", ["to@example.com"]
         )
+        self.assertTrue(task_result)
+        self.mock_connection.close.assert_called_once()
+        self.assertEqual(self.mock_get_connection.call_count, 2)
+
+    def test_failed_open_is_not_cached(self):
+        """
+        Test that a connection that failed to open is not reused by the next task.
+        """
+        self.mock_connection.open.side_effect = [
+            smtplib.SMTPAuthenticationError(535, b"Authentication failed"),
+            None,
+        ]
+        self.assertFalse(
+            send_email_task("Subject", "Message", "from@example.com", ["a@example.com"])
+        )
+        self.assertTrue(
+            send_email_task("Subject", "Message", "from@example.com", ["b@example.com"])
+        )
+        self.assertEqual(self.mock_connection.open.call_count, 2)
+        self.mock_connection.send_messages.assert_called_once()
+
+
+class TestSendMassEmailTask(TestCase):
+    """
+    Test the send_mass_email_task.
+    """
+
+    def setUp(self):
+        super().setUp()
+        close_email_connection()
+        self.addCleanup(close_email_connection)
+
+    def test_sends_one_email_per_recipient(self):
+        """
+        Test that each recipient gets their own email.
+        """
+        recipients = ["a@example.com", "b@example.com"]
+        results = send_mass_email_task(
+            "Subject", "Message", "from@example.com", recipients
+        )
+        self.assertEqual(results, {"sent": 2, "failed": []})
+        self.assertEqual([email.to for email in mail.outbox], [[r] for r in recipients])
+
+    @patch("main.tasks.get_connection")
+    def test_reports_failed_recipients(self, mock_get_connection):
+        """
+        Test that a failing recipient does not stop the batch and is reported.
+        """
+        mock_connection = mock_get_connection.return_value
+        mock_connection.send_messages.side_effect = [
+            1,
+            smtplib.SMTPRecipientsRefused({}),
+            1,
+        ]
+        results = send_mass_email_task(
+            "Subject",
+            "Message",
+            "from@example.com",
+            ["a@example.com", "b@example.com", "c@example.com"],
+        )
+        self.assertEqual(results, {"sent": 2, "failed": ["b@example.com"]})
+        mock_connection.open.assert_called_once()
+
+
+class TestBulkNotifyTask(TestCase):
+    """
+    Test the bulk_notify_task.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.users = UserFactory.create_batch(3)
+        self.inactive_user = UserFactory(is_active=False)
+
+    def test_notifies_active_users(self):
+        """
+        Test that every active user is notified when no ids are given.
+        """
+        created = bulk_notify_task("Title", "Message", "https://example.com")
+        self.assertEqual(created, 3)
+        self.assertFalse(Notification.objects.filter(user=self.inactive_user).exists())
+
+    def test_notifies_given_users(self):
+        """
+        Test that only the given active users are notified.
+        """
+        created = bulk_notify_task(
+            "Title",
+            "Message",
+            "https://example.com",
+            "success",
+            user_ids=[self.users[0].pk, self.inactive_user.pk],
+        )
+        self.assertEqual(created, 1)
+        notification = Notification.objects.get(title="Title")
+        self.assertEqual(notification.user, self.users[0])
+        self.assertEqual(notification.type, "success")
+
+
+@override_settings(NOTIFICATION_RETENTION_DAYS=30, NOTIFICATION_RETENTION_BATCH_SIZE=2)
+class TestPurgeReadNotificationsTask(TestCase):
+    """
+    Test the purge_read_notifications_task.
+    """
+
+    def setUp(self):
+        super().setUp()
+        old = timezone.now() - timedelta(days=31)
+        self.expired = NotificationFactory.create_batch(5, is_read=True)
+        self.old_unread = NotificationFactory()
+        self.recent_read = NotificationFactory(is_read=True)
+        Notification.objects.filter(
+            pk__in=[n.pk for n in self.expired] + [self.old_unread.pk]
+        ).update(created_at=old)
+
+    def test_deletes_old_read_notifications(self):
+        """
+        Test that only read notifications past the retention period are deleted.
+        """
+        self.assertEqual(purge_read_notifications_task(), 5)
+        self.assertEqual(
+            set(Notification.objects.values_list("pk", flat=True)),
+            {self.old_unread.pk, self.recent_read.pk},
+        )
+
+    def test_deletes_in_batches_with_signals(self):
+        """
+        Test that the batches delete every expired row and send a delete signal for each of them.
+        """
+        receiver = Mock()
+        post_delete.connect(receiver, sender=Notification)
+        self.addCleanup(post_delete.disconnect, receiver, sender=Notification)
+
+        self.assertEqual(purge_read_notifications_task(), 5)
+        self.assertEqual(receiver.call_count, 5)
+        self.assertFalse(
+            Notification.objects.filter(pk__in=[n.pk for n in self.expired]).exists()
+        )
+        self.assertEqual(Notification.objects.count(), 2)
+
+    def test_nothing_to_delete(self):
+        """
+        Test that the task reports zero when nothing is expired.
+        """
+        Notification.objects.all().delete()
+        self.assertEqual(purge_read_notifications_task(), 0)
+
+
+@override_settings(EMAIL_OUTBOX_BATCH_SIZE=2, EMAIL_OUTBOX_MAX_ATTEMPTS=2)
+class TestDrainEmailOutboxTask(TestCase):
+    """
+    Test the drain_email_outbox_task.
+    """
+
+    def setUp(self):
+        super().setUp()
+        close_email_connection()
+        self.addCleanup(close_email_connection)
+        self.recipients = ["a@example.com", "b@example.com", "c@example.com"]
+        OutgoingEmail.objects.queue(
+            "Subject", "Message", self.recipients, from_email="from@example.com"
+        )
+
+    def test_sends_pending_emails(self):
+        """
+        Test that all pending emails are sent across batches and marked as sent.
+        """
+        self.assertEqual(drain_email_outbox_task(), {"sent": 3, "failed": 0})
+        self.assertEqual(sorted(email.to[0] for email in mail.outbox), self.recipients)
+        self.assertFalse(
+            OutgoingEmail.objects.exclude(status=EmailStatus.SENT.value).exists()
+        )
+        self.assertFalse(OutgoingEmail.objects.filter(sent_at=None).exists())
+
+    def test_sent_emails_are_not_resent(self):
+        """
+        Test that a second run has nothing left to send.
+        """
+        drain_email_outbox_task()
+        self.assertEqual(drain_email_outbox_task(), {"sent": 0, "failed": 0})
+        self.assertEqual(len(mail.outbox), 3)
+
+    @patch("main.tasks.send_messages", side_effect=smtplib.SMTPException("boom"))
+    def test_failures_are_retried_then_failed(self, mock_send_messages):
+        """
+        Test that failing emails stay pending until they run out of attempts.
+        """
+        self.assertEqual(drain_email_outbox_task(), {"sent": 0, "failed": 3})
+        self.assertEqual(mock_send_messages.call_count, 3)
+        self.assertEqual(
+            OutgoingEmail.objects.filter(status=EmailStatus.PENDING.value).count(), 3
+        )
+
+        drain_email_outbox_task()
+        self.assertEqual(
+            OutgoingEmail.objects.filter(
+                status=EmailStatus.FAILED.value, attempts=2, last_error="boom"
+            ).count(),
+            3,
+        )
+
+
+class TestTaskResultPolicies(TestCase):
+    """
+    Test which tasks store their results in the django-db result backend.
+    """
+
+    def apply_storing_results(self, task, *args):
+        """
+        Run a task eagerly the way a worker would, storing its result in the database backend.
+        """
+        task_class = type(current_app.tasks[task.name])
+        with patch.object(
+            task_class, "backend", DatabaseBackend(app=current_app)
+        ), patch.object(task_class, "store_eager_result", True):
+            task.apply(args=args)
+
+    def test_email_task_stores_no_result(self):
+        """
+        Test that the fire-and-forget email task writes no result row.
+        """
+        self.apply_storing_results(
+            send_email_task, "Subject", "Message", "from@example.com", ["a@example.com"]
+        )
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertFalse(TaskResult.objects.exists())
+
+    def test_bulk_tasks_store_compact_results(self):
+        """
+        Test that the bulk tasks store a summary without their call arguments.
+        """
+        user = UserFactory()
+        self.apply_storing_results(
+            send_mass_email_task,
+            "Subject",
+            "Message",
+            "from@example.com",
+            ["a@example.com", "b@example.com"],
+        )
+        self.apply_storing_results(
+            bulk_notify_task,
+            "Title",
+            "Message",
+            "https://example.com",
+            "info",
+            [user.pk],
+        )
+        mass_email = TaskResult.objects.get(task_name=send_mass_email_task.name)
+        self.assertEqual(json.loads(mass_email.result), {"sent": 2, "failed": []})
+        notify = TaskResult.objects.get(task_name=bulk_notify_task.name)
+        self.assertEqual(notify.result, "1")
+        for result in (mass_email, notify):
+            self.assertEqual(result.task_args, '"()"')
+            self.assertEqual(result.task_kwargs, '"{}"')
+
+    def test_other_tasks_store_results(self):
+        """
+        Test that tasks with a meaningful result still store it.
+        """
+        UserFactory()
+        self.apply_storing_results(
+            bulk_notify_task, "Title", "Message", "https://example.com"
+        )
+        result = TaskResult.objects.get(task_name=bulk_notify_task.name)
+        self.assertEqual(result.result, "1")
+
+
+@override_settings(TASK_RESULT_RETENTION_DAYS=7, TASK_RESULT_PURGE_BATCH_SIZE=2)
+class TestPurgeTaskResultsTask(TestCase):
+    """
+    Test the purge_task_results_task.
+    """
+
+    def test_deletes_old_results(self):
+        """
+        Test that only task and group results past the retention period are deleted.
+        """
+        for i in range(3):
+            TaskResult.objects.create(task_id=f"old-{i}")
+        GroupResult.objects.create(group_id="old-group")
+        recent = TaskResult.objects.create(task_id="recent")
+        old = timezone.now() - timedelta(days=8)
+        TaskResult.objects.exclude(pk=recent.pk).update(date_done=old)
+        GroupResult.objects.update(date_done=old)
+
+        self.assertEqual(purge_task_results_task(), 4)
+        self.assertEqual(list(TaskResult.objects.all()), [recent])
+        self.assertFalse(GroupResult.objects.exists())
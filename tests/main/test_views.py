@@ -1,10 +1,16 @@
-from django.test import TestCase
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, RequestFactory
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from main.consts import ContactType
 from main.forms import ContactForm
-from main.models import Contact, TermsAndConditions, PrivacyPolicy
-from tests.factories.main import NotificationFactory
+from main.views import TermsAndConditionsView
+from main.models import Contact, TermsAndConditions, PrivacyPolicy, Notification
+from tests.factories.main import NotificationFactory, SocialMediaLinkFactory
+from tests.factories.users import UserFactory
 
 
 class MarkAsReadAndRedirectViewTestCase(TestCase):
@@ -35,6 +41,36 @@ class MarkAsReadAndRedirectViewTestCase(TestCase):
         self.assertEqual(response.status_code, 302)
         self.assertEqual(response.url, self.notification.link)
 
+    def test_unread_notification_single_query(self):
+        """
+        Test that the owner marking an unread notification costs a single notification query.
+        """
+        self.client.force_login(self.notification.user)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.url)
+        statements = [q["sql"] for q in queries if "main_notification" in q["sql"]]
+        self.assertEqual(len(statements), 1)
+        self.assertTrue(statements[0].startswith("UPDATE"))
+
+    def test_other_user_does_not_mark_notification(self):
+        """
+        Test that another logged in user is redirected without marking the notification as read.
+        """
+        self.client.force_login(UserFactory())
+        response = self.client.get(self.url)
+        self.notification.refresh_from_db()
+        self.assertFalse(self.notification.is_read)
+        self.assertEqual(response.status_code, 302)
+
+    def test_already_read_notification_redirected(self):
+        """
+        Test that an already read notification still redirects to the destination URL.
+        """
+        self.client.get(self.url)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response.url, self.notification.link)
+
     def test_non_matching_link(self):
         """
         Test if the view returns a 404 when the ID exists but the link doesn't match.
@@ -52,6 +88,99 @@ class MarkAsReadAndRedirectViewTestCase(TestCase):
         self.assertEqual(response.status_code, 404)
 
 
+class MarkAllAsReadViewTestCase(TestCase):
+    """
+    Test cases for the MarkAllAsReadView.
+    """
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.user = UserFactory()
+        NotificationFactory.create_batch(2, user=self.user)
+        self.url = reverse("mark_all_as_read")
+
+    def test_login_required(self):
+        """
+        Test that anonymous users are redirected to the login page.
+        """
+        response = self.client.post(self.url)
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response.url.startswith(reverse("login")))
+
+    def test_get_not_allowed(self):
+        """
+        Test that only POST requests are accepted.
+        """
+        self.client.force_login(self.user)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 405)
+
+    def test_marks_all_and_redirects_to_next(self):
+        """
+        Test that all unread notifications are marked and the user is sent back.
+        """
+        self.client.force_login(self.user)
+        response = self.client.post(self.url, {"next": "/contact-us/"})
+        self.assertRedirects(response, "/contact-us/", fetch_redirect_response=False)
+        self.assertFalse(Notification.objects.unread(self.user.pk).exists())
+
+    def test_unsafe_next_redirects_home(self):
+        """
+        Test that an external next URL is ignored.
+        """
+        self.client.force_login(self.user)
+        response = self.client.post(self.url, {"next": "https://evil.example.com/"})
+        self.assertRedirects(response, reverse("home"), fetch_redirect_response=False)
+
+
+class RequestTransactionTests(TestCase):
+    """
+    Test that only requests writing to the database run in a transaction.
+
+    Tests already run inside a transaction, so a request transaction shows up as a SAVEPOINT.
+    """
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def count_savepoints(self, method: str, url: str, **kwargs) -> int:
+        """
+        Return the number of savepoints created while handling a request.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            getattr(self.client, method)(url, **kwargs)
+        return sum(q["sql"].startswith("SAVEPOINT") for q in queries)
+
+    def test_read_only_requests(self):
+        """
+        Test that read-only pages are rendered without a transaction.
+        """
+        TermsAndConditions.objects.create(terms="Terms")
+        PrivacyPolicy.objects.create(policy="Policy")
+        for name in ("home", "terms_and_conditions", "privacy_policy", "contact_us"):
+            with self.subTest(name=name):
+                self.assertEqual(self.count_savepoints("get", reverse(name)), 0)
+
+    def test_write_requests(self):
+        """
+        Test that submitting the contact form and marking a notification run in a transaction.
+        """
+        notification = NotificationFactory()
+        mark_as_read_url = reverse(
+            "mark_as_read_and_redirect",
+            kwargs={
+                "notification_id": notification.id,
+                "destination_url": notification.link,
+            },
+        )
+        self.assertEqual(self.count_savepoints("get", mark_as_read_url), 1)
+        self.assertEqual(
+            self.count_savepoints("post", reverse("contact_us"), data={}), 1
+        )
+
+
 class ContactUsViewTests(TestCase):
     """
     Unit tests for the ContactUsView.
@@ -153,6 +282,89 @@ class TermsAndConditionsViewTests(TestCase):
         self.assertContains(response, "This is a test terms and conditions page.")
 
 
+class CurrentDocumentConditionalGetTests(TestCase):
+    """
+    Unit tests for the conditional GET support of the terms and privacy policy pages.
+    """
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.url = reverse("privacy_policy")
+        PrivacyPolicy.objects.create(policy="This is a test privacy policy page.")
+
+    def test_headers_for_anonymous_users(self):
+        """
+        Test that anonymous visitors get an ETag and Last-Modified header.
+        """
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("ETag", response)
+        self.assertIn("Last-Modified", response)
+
+    def test_not_modified(self):
+        """
+        Test that a repeat visit with a matching ETag gets a 304.
+        """
+        etag = self.client.get(self.url)["ETag"]
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+
+    def test_new_version_changes_etag(self):
+        """
+        Test that a new version of the document is served in full.
+        """
+        etag = self.client.get(self.url)["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            PrivacyPolicy.objects.create(policy="This is the new privacy policy.")
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "This is the new privacy policy.")
+
+    def test_edited_document_changes_etag(self):
+        """
+        Test that a document edited in place is served in full.
+        """
+        etag = self.client.get(self.url)["ETag"]
+        policy = PrivacyPolicy.objects.get()
+        policy.policy = "This is the edited privacy policy."
+        with self.captureOnCommitCallbacks(execute=True):
+            policy.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "This is the edited privacy policy.")
+
+    def test_footer_change_changes_etag(self):
+        """
+        Test that a change to the footer's social media links is served in full.
+        """
+        etag = self.client.get(self.url)["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            SocialMediaLinkFactory()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_no_headers_for_authenticated_users(self):
+        """
+        Test that authenticated users always get the full page.
+        """
+        self.client.force_login(UserFactory())
+        response = self.client.get(self.url)
+        self.assertNotIn("ETag", response)
+        self.assertNotIn("Last-Modified", response)
+
+    def test_missing_document(self):
+        """
+        Test that no conditional headers are computed without a document.
+        """
+        request = RequestFactory().get(reverse("terms_and_conditions"))
+        request.user = AnonymousUser()
+        view = TermsAndConditionsView()
+        self.assertIsNone(view.get_etag(request))
+        self.assertIsNone(view.get_last_modified(request))
+
+
 class PrivacyPolicyViewTests(TestCase):
     """
     Unit tests for the PrivacyPolicyView.
@@ -12,16 +12,43 @@ DATABASES = {
         "HOST": "db",  # it is db because it is the container hostname
         "PORT": "5432",
         "ATOMIC_REQUESTS": True,
-    }
+    },
+    # A separate database standing in for the replica, so the routing tests can tell where a read went
+    "replica": {
+        "ENGINE": "django.db.backends.postgresql_psycopg2",
+        "NAME": "django-test-replica",
+        "USER": "django",
+        "PASSWORD": "django",
+        "HOST": "db",
+        "PORT": "5432",
+    },
 }
 
+# Nothing is read from the replica unless a test routes models to it
+REPLICA_ROUTED_MODELS = []
+
 SENTRY_ENV = "test_runner"
 
 # This is added here because the tests need to be able to access the media files
 MEDIA_ROOT = BASE_DIR / "media"
 MEDIA_URL = "/media/"
 
+# The tests use a process local cache instead of Redis. The first tier of main.cache.tiered_cache is
+# disabled so clearing the default cache is enough to isolate tests.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "default",
+    },
+    "local": {
+        "BACKEND": "django.core.cache.backends.dummy.DummyCache",
+    },
+}
+
 # Celery test settings
 CELERY_BROKER_URL = "memory://"
 CELERY_RESULT_BACKEND = "cache+memory://"
 CELERY_TASK_ALWAYS_EAGER = True
+
+# Pages are rendered on every request unless a test enables the page cache
+PAGE_CACHE_ENABLED = False
@@ -0,0 +1,69 @@
+from unittest import mock
+
+from celery.fixups.django import DjangoWorkerFixup
+from django.db import connection
+from django.test import TransactionTestCase
+
+from django_template.celery import app
+
+
+class CeleryConnectionReuseTest(TransactionTestCase):
+    """
+    Test cases for the reuse of database connections between Celery tasks.
+    """
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.fixup = DjangoWorkerFixup(app)
+        self.sender = mock.Mock(request=mock.Mock(is_eager=False))
+
+    def run_task(self) -> None:
+        """
+        Send the signals a worker sends around a task, then let the task use the database.
+        """
+        self.fixup.on_task_prerun(sender=self.sender)
+        self.fixup.on_task_postrun(sender=self.sender)
+        connection.ensure_connection()
+
+    def connect(self, **settings) -> None:
+        """
+        Open a new connection with the given database settings.
+        """
+        patcher = mock.patch.dict(connection.settings_dict, settings)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(connection.close)
+        connection.close()
+        connection.ensure_connection()
+
+    def test_connection_reused(self):
+        """
+        Test that a worker keeps its connection between tasks while it is younger than CONN_MAX_AGE.
+        """
+        self.connect(CONN_MAX_AGE=60, CONN_HEALTH_CHECKS=True)
+        raw_connection = connection.connection
+        self.run_task()
+        self.run_task()
+        self.assertIs(connection.connection, raw_connection)
+
+    def test_connection_closed_without_max_age(self):
+        """
+        Test that a worker opens a new connection per task when CONN_MAX_AGE is 0.
+        """
+        self.connect(CONN_MAX_AGE=0)
+        raw_connection = connection.connection
+        self.run_task()
+        self.assertIsNot(connection.connection, raw_connection)
+
+    def test_broken_connection_replaced(self):
+        """
+        Test that the health check replaces a connection that died between tasks.
+        """
+        self.connect(CONN_MAX_AGE=60, CONN_HEALTH_CHECKS=True)
+        raw_connection = connection.connection
+        self.fixup.on_task_postrun(sender=self.sender)
+        raw_connection.close()  # e.g. the server restarted
+        self.fixup.on_task_prerun(sender=self.sender)
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        self.assertIsNot(connection.connection, raw_connection)
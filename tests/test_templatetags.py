@@ -1,7 +1,9 @@
 from django import forms
+from django.core.cache import cache
 from django.template import Context, Template
 
 from tests.base import BaseTestCase
+from tests.factories.main import SocialMediaLinkFactory
 
 
 class AddClassTemplateTagTest(BaseTestCase):
@@ -33,3 +35,35 @@ class AddClassTemplateTagTest(BaseTestCase):
 
         # Check if the class is added to the widget
         self.assertIn('class="desired-css-class"', rendered_template)
+
+
+class SocialMediaRowTemplateTagTest(BaseTestCase):
+    """Test cases for the 'social_media_row' inclusion tag."""
+
+    template = Template("{% load custom_filters %}{% social_media_row %}")
+
+    def setUp(self) -> None:
+        """Setup the initial data for the tests."""
+        super().setUp()
+        cache.clear()
+        self.link = SocialMediaLinkFactory(platform_name="Platform")
+
+    def test_links_are_cached(self) -> None:
+        """Test that only the first render queries the database."""
+        with self.assertNumQueries(1):
+            rendered_template = self.template.render(Context())
+        with self.assertNumQueries(0):
+            self.assertEqual(self.template.render(Context()), rendered_template)
+        self.assertIn(self.link.profile_url, rendered_template)
+
+    def test_save_invalidates_cache(self) -> None:
+        """Test that saving or deleting a link refreshes the rendered links."""
+        self.template.render(Context())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            new_link = SocialMediaLinkFactory(platform_name="NewPlatform")
+        self.assertIn(new_link.profile_url, self.template.render(Context()))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            new_link.delete()
+        self.assertNotIn(new_link.profile_url, self.template.render(Context()))
@@ -1,3 +1,5 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from tests.base import BaseTestCase
 from tests.factories.users import UserFactory
@@ -67,6 +69,21 @@ class RegisterViewTest(BaseAuthenticationTest):
         self.assertEqual(response.status_code, 302)
         self.assertTrue(User.objects.filter(username="newuser").exists())
 
+    def test_transaction_only_for_post(self) -> None:
+        """Test that only a registration runs in a transaction, displaying the form does not."""
+        data = {
+            "username": "newuser",
+            "email": "newuser@example.com",
+            "password1": "testpassword123",
+            "password2": "testpassword123",
+        }
+        for method, kwargs in (("get", {}), ("post", {"data": data})):
+            with CaptureQueriesContext(connection) as queries:
+                getattr(self.client, method)(reverse("register"), **kwargs)
+            savepoints = [q for q in queries if q["sql"].startswith("SAVEPOINT")]
+            with self.subTest(method=method):
+                self.assertEqual(bool(savepoints), method == "post")
+
     def test_get_context_data(self):
         """Test that the register view includes the UserCreationForm in its context."""
         response = self.client.get(reverse("register"))
@@ -1,5 +1,7 @@
 from django.contrib.auth import login
+from django.db import transaction
 from django.shortcuts import redirect, resolve_url
+from django.utils.decorators import method_decorator
 from django.views.generic import TemplateView
 
 from django.contrib.auth.views import (
@@ -34,8 +36,13 @@ class LoginView(LoginViewBase):
         return resolve_url("home")
 
 
+@method_decorator(transaction.non_atomic_requests, name="dispatch")
 class RegisterView(TemplateView):
-    """Custom register view that uses the UserCreationForm."""
+    """
+    Custom register view that uses the UserCreationForm.
+
+    Creating the account and logging the new user in happen in one transaction.
+    """
 
     template_name = "users/register.html"
 
@@ -49,6 +56,7 @@ class RegisterView(TemplateView):
         context["form"] = UserCreationForm()
         return context
 
+    @method_decorator(transaction.atomic)
     def post(self, request, *args, **kwargs):
         """
         Overriding the default post method to handle the form submission